@@ -0,0 +1,95 @@
+import time
+
+from spatialyze.database import database
+from spatialyze.predicate import camera, objects
+from spatialyze.utils import F
+
+# Queries from tests/engine/scenic, run against the same database
+o0, o1, o2 = objects[0], objects[1], objects[2]
+c = camera
+QUERIES = {
+    "fig_12": (
+        F.like(o0.type, "human.pedestrian%")
+        & F.contains("road", c.ego)
+        & F.contains("road", o0)
+        & F.heading_diff(o0, c.ego, between=[-70, 70])
+        & F.heading_diff(c.ego, F.road_direction(c.ego, c.ego), between=[-15, 15])
+        & (F.distance(c, o0) < 50)
+        & (F.view_angle(o0, c) < 35)
+    ),
+    "fig_13": (
+        (o0.id != o1.id)
+        & F.like(o0.type, "vehicle%")
+        & F.like(o1.type, "vehicle%")
+        & F.heading_diff(c.ego, F.road_direction(c.ego, c.ego), between=[-15, 15])
+        & (F.distance(c.ego, o0) < 50)
+        & (F.view_angle(o0, c.ego) < 70 / 2.0)
+        & (F.distance(c.ego, o1) < 50)
+        & (F.view_angle(o1, c.ego) < 70 / 2.0)
+        & F.contains("intersection", [o0, o1])
+        & F.heading_diff(o0, c.ego, between=[50, 135])
+        & F.heading_diff(o1, c.ego, between=[-135, -50])
+        & (F.min_distance(c.ego, F.road_segment("intersection")) < 10)
+        & F.heading_diff(o0, o1, between=[100, -100])
+    ),
+    "fig_14": (
+        F.like(o0.type, "vehicle%")
+        & (F.distance(c.ego, o0) < 50)
+        & (F.view_angle(o0, c.ego) < 70 / 2)
+        & F.heading_diff(c.ego, F.road_direction(c.ego, c.ego), between=[-180, -90])
+        & F.contains("road", c.ego)
+        & F.contains("road", o0)
+        & F.heading_diff(o0, F.road_direction(o0, c.ego), between=[-15, 15])
+        & (F.distance(c.ego, o0) < 10)
+    ),
+    "fig_15": (
+        F.like(o0.type, "vehicle%")
+        & F.like(o1.type, "vehicle%")
+        & F.like(o2.type, "vehicle%")
+        & (o2.id != o1.id)
+        & (o0.id != o1.id)
+        & (o0.id != o2.id)
+        & F.heading_diff(c.ego, F.road_direction(c.ego, c.ego), between=[-15, 15])
+        & (F.view_angle(o0, c.ego) < 70 / 2)
+        & (F.distance(c.ego, o0) < 40)
+        & F.heading_diff(o0, c.ego, between=[-15, 15])
+        & F.heading_diff(o0, F.road_direction(o0, c.ego), between=[-15, 15])
+        & F.ahead(o0, c.ego)
+        & (F.convert_camera(o2, c.ego) > [-10, 0])
+        & (F.convert_camera(o2, c.ego) < [-1, 50])
+        & F.heading_diff(o2, c.ego, between=[140, 180])
+        & (F.distance(o2, o1) < 40)
+        & F.heading_diff(o1, F.road_direction(o1, c.ego), between=[-15, 15])
+        & F.ahead(o1, o2)
+    ),
+    "fig_16": (
+        F.contains("lane", c.ego)
+        & F.heading_diff(c.ego, F.road_direction(c.ego), between=[-15, 15])
+        & F.like(o0.type, "vehicle%")
+        & (F.convert_camera(o0, c.ego) > [0, 0])
+        & (F.convert_camera(o0, c.ego) < [4, 5])
+        & F.heading_diff(o0, F.road_direction(o0), between=[-30, -15])
+    ),
+}
+REPEAT = 5
+
+
+def benchmark(plan_joins: bool) -> "dict[str, tuple[float, set]]":
+    database.plan_joins = plan_joins
+    runtimes = {}
+    for name, query in QUERIES.items():
+        start = time.time()
+        for _ in range(REPEAT):
+            results = database.predicate(query)
+        runtimes[name] = (time.time() - start) / REPEAT, set(results)
+    return runtimes
+
+
+if __name__ == "__main__":
+    baseline = benchmark(False)
+    planned = benchmark(True)
+    print(f"{'query':<8} {'baseline (s)':>12} {'planned (s)':>12} {'speedup':>8}")
+    for name in QUERIES:
+        (b, b_results), (p, p_results) = baseline[name], planned[name]
+        assert b_results == p_results, name
+        print(f"{name:<8} {b:>12.4f} {p:>12.4f} {b / p:>7.2f}x")
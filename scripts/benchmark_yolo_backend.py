@@ -0,0 +1,65 @@
+"""
+Compare the startup time and throughput of the eager PyTorch Yolo with exported models.
+
+    python scripts/benchmark_yolo_backend.py <video> <exported model>... [--threads N]
+
+Export the models with YOLOv5's export script (in spatialyze/video_processor/modules/yolo_tracker/yolov5):
+
+    python export.py --weights yolov5s.pt --include onnx torchscript
+"""
+
+import argparse
+import time
+
+import cv2
+import torch
+
+from spatialyze.video_processor.stream.decode_frame import DecodeFrame
+from spatialyze.video_processor.stream.yolo import Yolo
+from spatialyze.video_processor.video import Video
+
+REPEAT = 3
+
+
+def benchmark(video: Video, weights: "str | None", threads: "int | None") -> "tuple[float, float]":
+    """
+    Returns the startup time of Yolo in seconds, and its frames per second.
+    """
+    start = time.time()
+    yolo = Yolo(DecodeFrame(), weights=weights, threads=threads)
+    startup = time.time() - start
+
+    frames = 0
+    runtime = 0.0
+    for _ in range(REPEAT):
+        yolo.execute(video)
+        # time spent in Yolo, excluding decoding
+        frames += yolo.stats.produced
+        runtime += yolo.stats.wall_time
+    return startup, frames / runtime
+
+
+def num_frames(videofile: str) -> int:
+    cap = cv2.VideoCapture(videofile)
+    length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return length
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("weights", nargs="*")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads is not None:
+        # for PyTorch and TorchScript models; ONNX Runtime sessions get their own threads
+        torch.set_num_threads(args.threads)
+
+    video = Video(args.video, [None] * num_frames(args.video))  # type: ignore
+    backends = [None, *args.weights]
+    results = [benchmark(video, weights, args.threads) for weights in backends]
+    _, baseline = results[0]
+    print(f"{'backend':<24} {'startup (s)':>12} {'fps':>8} {'speedup':>8}")
+    for weights, (startup, fps) in zip(backends, results):
+        print(f"{weights or 'eager':<24} {startup:>12.2f} {fps:>8.2f} {fps / baseline:>7.2f}x")
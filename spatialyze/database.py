@@ -1,13 +1,21 @@
 import datetime
-from collections.abc import Mapping, Sequence
+import io
+import itertools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable, Iterator, Mapping, Sequence
 from os import environ
-from typing import TYPE_CHECKING, Callable, NamedTuple
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple
 
 import pandas as pd
 import psycopg2
 import psycopg2.errors
-from postgis import Point
+from postgis import Geometry, Point
 from postgis.psycopg import register as postgis_register
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.sql import SQL, Composable, Literal
 
 from .data_types.camera_key import CameraKey
@@ -15,10 +23,15 @@ from .data_types.nuscenes_annotation import NuscenesAnnotation
 from .data_types.nuscenes_camera import NuscenesCamera
 from .data_types.query_result import QueryResult
 from .predicate import (
+    BoolOpNode,
+    CallNode,
+    CompOpNode,
     FindAllTablesVisitor,
     GenSqlVisitor,
     MapTablesTransformer,
+    PredicateNode,
     normalize,
+    structural_key,
 )
 from .utils.ingest_processed_nuscenes import ingest_processed_nuscenes
 from .utils.ingest_road import (
@@ -35,7 +48,13 @@ if TYPE_CHECKING:
     from psycopg2._psycopg import connection as Connection
     from psycopg2._psycopg import cursor as Cursor
 
-    from .predicate import PredicateNode
+
+# Maximum number of connections open at once in a ConnectionPool
+POOL_SIZE = int(environ.get("AP_POOL_SIZE", "8"))
+# Number of rows fetched from the server at a time by streaming queries
+ITERSIZE = int(environ.get("AP_ITERSIZE", "2000"))
+# Number of compiled predicates (and prepared statements) kept by a Database
+PREDICATE_CACHE_SIZE = 64
 
 CAMERA_TABLE = "Camera"
 TRAJECTORY_TABLE = "Item_Trajectory"
@@ -49,6 +68,12 @@ TABLES = (
     BBOX_TABLE,
     METADATA_TABLE,
 )
+VIDEO_TABLES = (
+    CAMERA_TABLE,
+    DETECTION_TABLE,
+    TRAJECTORY_TABLE,
+    METADATA_TABLE,
+)
 
 CAMERA_COLUMNS: "list[tuple[str, str]]" = [
     ("cameraId", "TEXT"),
@@ -91,10 +116,24 @@ BBOX_COLUMNS: "list[tuple[str, str]]" = [
     ("timestamp", "timestamptz"),
 ]
 
+# Buffered trajectory rows are written once there are this many of them ...
+TRAJECTORY_BUFFER_SIZE = 2048
+# ... or once the oldest of them has been buffered for this many seconds.
+TRAJECTORY_BUFFER_SECONDS = 10.0
+
 METADATA_COLUMNS: "list[tuple[str, str]]" = [
+    ("cameraId", "TEXT"),
     ("fps", "Int"),
 ]
 
+# Columns and primary key of each video table, checked by `Database.initialize`
+VIDEO_SCHEMA: "dict[str, tuple[list[tuple[str, str]], tuple[str, ...]]]" = {
+    CAMERA_TABLE: (CAMERA_COLUMNS, ("cameraId", "frameNum")),
+    DETECTION_TABLE: (DETECTION_COLUMNS, ("cameraId", "itemId")),
+    TRAJECTORY_TABLE: (TRAJECTORY_COLUMNS, ("cameraId", "itemId", "frameNum")),
+    METADATA_TABLE: (METADATA_COLUMNS, ("cameraId",)),
+}
+
 
 def columns(fn: "Callable[[tuple[str, str]], str]", columns: "list[tuple[str, str]]") -> str:
     return ",".join(map(fn, columns))
@@ -104,16 +143,242 @@ def _schema(column: "tuple[str, str]") -> str:
     return " ".join(column)
 
 
-class Database:
-    connection: "Connection"
-    cursor: "Cursor"
+def _primary_key(table: "str") -> str:
+    _, key = VIDEO_SCHEMA[table]
+    return ", ".join(key)
+
+
+def _name(column: "tuple[str, str]") -> str:
+    return column[0]
+
+
+Loader = Callable[["Cursor", str, "list[tuple[str, str]]", "Iterable[tuple]"], None]
+
+
+def copy_loader(
+    cursor: "Cursor",
+    table: "str",
+    columns_: "list[tuple[str, str]]",
+    rows: "Iterable[tuple]",
+):
+    """
+    Load rows into a table with `COPY ... FROM STDIN`, using PostgreSQL's text format.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(map(_copy_value, row)))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({columns(_name, columns_)}) FROM STDIN", buffer)
+
+
+def insert_loader(
+    cursor: "Cursor",
+    table: "str",
+    columns_: "list[tuple[str, str]]",
+    rows: "Iterable[tuple]",
+):
+    """
+    Load rows into a table with one multi-row `INSERT` statement.
+    """
+    insert = SQL(f"INSERT INTO {table} ({columns(_name, columns_)}) VALUES ")
+    values = SQL(",").join(SQL("({})").format(SQL(",").join(map(Literal, row))) for row in rows)
+    cursor.execute(insert + values)
+
+
+_COPY_ESCAPE = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(value: "Any") -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, Geometry):
+        return value.to_ewkb()
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return _copy_array(value)
+    return str(value).translate(_COPY_ESCAPE)
+
+
+def _copy_array(values: "list | tuple") -> str:
+    def element(value: "Any") -> str:
+        if value is None:
+            return "NULL"
+        if isinstance(value, (list, tuple)):
+            return _copy_array(value)
+        return str(value)
+
+    return "{" + ",".join(map(element, values)) + "}"
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of connections opened with the same parameters.
+    Connections are only opened when a Database first uses one.
+    A pool used in a forked process opens new connections instead of the inherited ones.
+    """
+
+    def __init__(self, size: "int" = POOL_SIZE, **params: "str"):
+        self.size = size
+        self.params = params
+        self._lock = threading.Lock()
+        self._pool: "ThreadedConnectionPool | None" = None
+        self._pid = os.getpid()
+        self._stale_pools: "list[ThreadedConnectionPool]" = []
+
+    def getconn(self) -> "Connection":
+        with self._lock:
+            if self._pid != os.getpid():
+                # Connections inherited from the parent process must not be used nor closed
+                if self._pool is not None:
+                    self._stale_pools.append(self._pool)
+                self._pool = None
+                self._pid = os.getpid()
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(0, self.size, **self.params)
+            return self._pool.getconn()
+
+    def putconn(self, connection: "Connection"):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.putconn(connection)
+
+    def database(self) -> "Database":
+        """
+        Returns a Database that borrows a connection from this pool on first use.
+        """
+        return Database(pool=self)
 
-    def __init__(self, connection: "Connection"):
-        self.connection = connection
-        postgis_register(self.connection)
-        self.cursor = self.connection.cursor()
+
+class Database:
+    params: "dict[str, Any] | None"
+    pool: "ConnectionPool | None"
+    schema: "str | None"
+    loader: "Loader"
+    plan_joins: bool
+    buffer_size: int
+    buffer_seconds: float
+
+    def __init__(
+        self,
+        connection: "Connection | None" = None,
+        params: "dict[str, Any] | None" = None,
+        pool: "ConnectionPool | None" = None,
+    ):
+        """
+        A Database either wraps an open `connection`, or opens one on first use,
+        from `pool` or with `params` (keyword arguments of `psycopg2.connect`).
+        """
+        assert (connection is not None) + (params is not None) + (
+            pool is not None
+        ) == 1, "Database requires exactly one of connection, params, or pool"
+        self._connection = connection
+        self._cursor: "Cursor | None" = None
+        self.params = params
+        self.pool = pool
+        self.schema = None
+        self.loader = copy_loader
+        self.plan_joins = True
+        self.buffer_size = TRAJECTORY_BUFFER_SIZE
+        self.buffer_seconds = TRAJECTORY_BUFFER_SECONDS
+        self._trajectory_buffer: "list[tuple]" = []
+        self._trajectory_buffer_start: "float | None" = None
+        self._stale_connections: "list[Connection]" = []
+        self._compiled_predicates: "OrderedDict[Hashable, tuple[str, str]]" = OrderedDict()
+        # Prepared statements of the current connection
+        self._prepared_statements: "OrderedDict[tuple[Hashable, bool], str]" = OrderedDict()
+        if connection is not None:
+            postgis_register(connection)
+
+    @classmethod
+    def connect(cls, **params: "Any") -> "Database":
+        """
+        Create a Database that connects with `params` on first use,
+        and that can be reopened with `reconnect` (e.g. inside a worker process).
+        """
+        return cls(params=params)
+
+    @property
+    def connection(self) -> "Connection":
+        if self._connection is None:
+            if self.pool is not None:
+                self._connection = self.pool.getconn()
+            else:
+                assert self.params is not None, "Database has no connection to reopen"
+                self._connection = psycopg2.connect(**self.params)
+            postgis_register(self._connection)
+            if self.schema is not None:
+                self.use_schema(self.schema)
+        return self._connection
+
+    @property
+    def cursor(self) -> "Cursor":
+        if self._cursor is None:
+            self._cursor = self.connection.cursor()
+        return self._cursor
+
+    @cursor.setter
+    def cursor(self, cursor: "Cursor"):
+        self._cursor = cursor
+
+    @property
+    def reconnectable(self) -> bool:
+        return self.params is not None or self.pool is not None
+
+    def reconnect(self):
+        """
+        Drop the current connection; a new one is opened on next use.
+        The old connection is kept referenced but never used again: after a fork it is
+        shared with the parent process, and closing it would terminate the parent's session.
+        """
+        assert self.reconnectable, "reconnect requires a Database created with params or a pool"
+        if self._connection is not None:
+            self._stale_connections.append(self._connection)
+        self._connection = None
+        self._cursor = None
+        self._prepared_statements.clear()
+
+    def close(self, commit=False):
+        """
+        Close the connection, or return it to the pool.
+        The open transaction is committed with `commit`, and rolled back otherwise.
+        A reconnectable Database opens a new connection on next use.
+        """
+        if self._connection is None:
+            return
+        if self._cursor is not None:
+            self._cursor.close()
+        if commit:
+            self._connection.commit()
+        else:
+            self._connection.rollback()
+        if self.pool is not None:
+            # Do not leak the schema (see `use_schema`) or the prepared statements of this
+            # Database to the next user of the pooled connection
+            self.update("RESET search_path; DEALLOCATE ALL;")
+            self.pool.putconn(self._connection)
+        else:
+            self._connection.close()
+        self._connection = None
+        self._cursor = None
+        self._prepared_statements.clear()
+
+    def use_schema(self, schema: "str"):
+        """
+        Create the video tables (Camera, Item_Trajectory, ...) in `schema` instead of `public`.
+        Road network tables are still resolved from `public`.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema};")
+        # Prepared statements are re-parsed with the new search_path on their next execution
+        cursor.execute(f"SET search_path TO {schema}, public;")
+        self.connection.commit()
+        cursor.close()
+        self.schema = schema
 
     def reset(self, commit=True):
+        self._discard_trajectory_buffer()
         self.reset_cursor()
         self._drop_table(commit)
         self._create_camera_table(commit)
@@ -123,6 +388,53 @@ class Database:
         self._create_metadata_table(commit)
         self._create_index(commit)
 
+    def initialize(self, commit=True):
+        """
+        Create the video tables and their indexes, unless they all already exist
+        with the columns and primary keys of this version (see `VIDEO_SCHEMA`).
+        Unlike `reset`, existing tables and their rows are kept; tables of another schema
+        version are dropped and recreated.
+        """
+        if not all(self._matches_schema(table) for table in VIDEO_TABLES):
+            self.reset(commit)
+
+    def _matches_schema(self, table: "str") -> bool:
+        expected_columns, expected_key = VIDEO_SCHEMA[table]
+        if self.schema is not None:
+            # not a table of the same name in public
+            table = f"{self.schema}.{table}"
+        ((found_columns, found_key),) = self.execute(
+            SQL(
+                """
+            SELECT
+                ARRAY(
+                    SELECT attname::text FROM pg_attribute
+                    WHERE attrelid = to_regclass({table}) AND attnum > 0 AND NOT attisdropped
+                    ORDER BY attnum
+                ),
+                ARRAY(
+                    SELECT attname::text
+                    FROM pg_index
+                    CROSS JOIN unnest(indkey) WITH ORDINALITY AS k(column_num, ordinal)
+                    JOIN pg_attribute ON attrelid = indrelid AND attnum = column_num
+                    WHERE indrelid = to_regclass({table}) AND indisprimary
+                    ORDER BY ordinal
+                )
+            """
+            ).format(table=Literal(table))
+        )
+        # unquoted identifiers are stored in lower case
+        columns = [name.lower() for name, _ in expected_columns]
+        key = [name.lower() for name in expected_key]
+        return found_columns == columns and found_key == key
+
+    def clear(self, commit=True):
+        """
+        Remove all rows from the video tables, keeping the tables and their indexes.
+        """
+        self._discard_trajectory_buffer()
+        self.update(f"TRUNCATE {','.join(VIDEO_TABLES)};", commit)
+
     def reset_cursor(self):
         self.cursor.close()
         assert self.cursor.closed
@@ -131,6 +443,8 @@ class Database:
     def _drop_table(self, commit=True):
         cursor = self.connection.cursor()
         for table in TABLES:
+            if self.schema is not None:
+                table = f"{self.schema}.{table}"
             cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE;")
         self._commit(commit)
         cursor.close()
@@ -140,7 +454,7 @@ class Database:
         cursor.execute(
             "CREATE TABLE Camera ("
             f"{columns(_schema, CAMERA_COLUMNS)},"
-            "PRIMARY KEY (cameraId, frameNum))"
+            f"PRIMARY KEY ({_primary_key(CAMERA_TABLE)}))"
         )
         self._commit(commit)
         cursor.close()
@@ -161,7 +475,7 @@ class Database:
         cursor.execute(
             f"CREATE TABLE {TRAJECTORY_TABLE} ("
             f"{columns(_schema, TRAJECTORY_COLUMNS)},"
-            "PRIMARY KEY (itemId, frameNum), "
+            f"PRIMARY KEY ({_primary_key(TRAJECTORY_TABLE)}), "
             "FOREIGN KEY (cameraId, frameNum) REFERENCES Camera(cameraId, frameNum))"
         )
         self._commit(commit)
@@ -172,7 +486,7 @@ class Database:
         cursor.execute(
             "CREATE TABLE Item_Detection ("
             f"{columns(_schema, DETECTION_COLUMNS)},"
-            "PRIMARY KEY (itemId),"
+            f"PRIMARY KEY ({_primary_key(DETECTION_TABLE)}),"
             "FOREIGN KEY (cameraId, frameNum) REFERENCES Camera(cameraId, frameNum))"
         )
         self._commit(commit)
@@ -180,7 +494,11 @@ class Database:
 
     def _create_metadata_table(self, commit=True):
         cursor = self.connection.cursor()
-        cursor.execute(f"CREATE TABLE Spatialyze_Metadata ({columns(_schema, METADATA_COLUMNS)})")
+        cursor.execute(
+            "CREATE TABLE Spatialyze_Metadata ("
+            f"{columns(_schema, METADATA_COLUMNS)},"
+            f"PRIMARY KEY ({_primary_key(METADATA_TABLE)}))"
+        )
         self._commit(commit)
         cursor.close()
 
@@ -249,6 +567,38 @@ class Database:
         cursor.close()
         return results
 
+    def _named_cursor(self, itersize: int) -> "Cursor":
+        cursor = self.connection.cursor(name=f"spatialyze_stream_{next(_cursor_ids)}")
+        cursor.itersize = itersize
+        return cursor
+
+    def _stream_error(self, error: "psycopg2.errors.DatabaseError"):
+        for notice in self.connection.notices:
+            print(notice)
+        self.connection.rollback()
+        raise error
+
+    def execute_iter(
+        self,
+        query: str | Composable,
+        vars: tuple | list | Sequence | Mapping | None = None,
+        itersize: int = ITERSIZE,
+    ) -> "Iterator[tuple]":
+        """
+        Execute a query with a server-side cursor and yield its rows,
+        fetching `itersize` rows from the server at a time.
+        The cursor lives in the current transaction: do not commit before the iterator is exhausted.
+        """
+        cursor = self._named_cursor(itersize)
+        try:
+            cursor.execute(query, vars)
+            yield from cursor
+        except psycopg2.errors.DatabaseError as error:
+            self._stream_error(error)
+        finally:
+            if not cursor.closed and not self.connection.closed:
+                cursor.close()
+
     def update(self, query: str | Composable, commit: bool = True) -> None:
         cursor = self.connection.cursor()
         try:
@@ -262,19 +612,79 @@ class Database:
         finally:
             cursor.close()
 
-    def insert_camera(self, camera: list[CameraConfig]):
+    def load(
+        self,
+        table: "str",
+        columns: "list[tuple[str, str]]",
+        rows: "Iterable[tuple]",
+        commit: bool = True,
+    ):
+        """
+        Insert rows into a table using `self.loader`.
+        Set `loader` to `insert_loader` to use INSERT statements instead of COPY.
+        """
+        rows = list(rows)
+        if len(rows) == 0:
+            return
+
         cursor = self.connection.cursor()
-        insert = SQL("INSERT INTO Camera VALUES ")
-        values = SQL(",").join(map(_config, camera))
-        cursor.execute(insert + values)
+        try:
+            self.loader(cursor, table, columns, rows)
+            self._commit(commit)
+        except psycopg2.errors.DatabaseError as error:
+            for notice in cursor.connection.notices:
+                print(notice)
+            self.connection.rollback()
+            raise error
+        finally:
+            cursor.close()
 
-        # print("New camera inserted successfully.........")
-        self.connection.commit()
-        cursor.close()
+    def insert_camera(self, camera: list[CameraConfig]):
+        self.load(CAMERA_TABLE, CAMERA_COLUMNS, map(_config, camera))
+
+    def insert_detections(self, detections: "Iterable[tuple]"):
+        """
+        Insert rows of (itemId, cameraId, objectType, frameNum, translation, timestamp).
+        """
+        self.load(DETECTION_TABLE, DETECTION_COLUMNS[:-1], detections)
+
+    def insert_trajectory(self, trajectory: "Iterable[tuple]"):
+        """
+        Insert rows of (itemId, cameraId, objectType, frameNum, translation, itemHeading).
+        """
+        self.load(TRAJECTORY_TABLE, TRAJECTORY_COLUMNS, trajectory)
+
+    def buffer_trajectory(self, trajectory: "Iterable[tuple]"):
+        """
+        Like `insert_trajectory`, but the rows are only written, all in one transaction,
+        once `buffer_size` rows are buffered, once the oldest buffered row is older than
+        `buffer_seconds`, or when `flush` is called.
+        """
+        if self._trajectory_buffer_start is None:
+            self._trajectory_buffer_start = time.monotonic()
+        self._trajectory_buffer.extend(trajectory)
+
+        if (
+            len(self._trajectory_buffer) >= self.buffer_size
+            or time.monotonic() - self._trajectory_buffer_start >= self.buffer_seconds
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered trajectory rows.
+        """
+        trajectory = self._trajectory_buffer
+        self._discard_trajectory_buffer()
+        self.insert_trajectory(trajectory)
+
+    def _discard_trajectory_buffer(self):
+        self._trajectory_buffer = []
+        self._trajectory_buffer_start = None
 
     def load_roadnetworks(self, dir: "str", location: "str"):
-        drop_tables(database)
-        create_tables(database)
+        drop_tables(self)
+        create_tables(self)
         ingest_location(self, dir, location)
         add_segment_type(self, ROAD_TYPES)
         self._commit()
@@ -286,29 +696,118 @@ class Database:
     ):
         ingest_processed_nuscenes(annotations, cameras, self)
 
-    def predicate(self, predicate: "PredicateNode", temporal: bool = True):
+    def predicate(
+        self,
+        predicate: "PredicateNode",
+        temporal: bool = True,
+        camera_id: "str | None" = None,
+    ) -> "list[QueryResult]":
+        return list(self.predicate_iter(predicate, temporal, camera_id, itersize=None))
+
+    def predicate_iter(
+        self,
+        predicate: "PredicateNode",
+        temporal: bool = True,
+        camera_id: "str | None" = None,
+        itersize: "int | None" = ITERSIZE,
+    ) -> "Iterator[QueryResult]":
+        """
+        Yield the results of `predicate` one at a time.
+        With an `itersize`, rows are streamed from a server-side cursor `itersize` rows at a time;
+        otherwise, all rows are fetched at once with a prepared statement.
+        """
+        self.flush()
+        if itersize is None:
+            rows = self._execute_prepared(predicate, temporal, camera_id)
+        else:
+            rows = self.execute_iter(
+                self._predicate_sql(predicate, temporal, camera_id), None, itersize
+            )
+        for frame_number, row_camera_id, filename, *item_ids in rows:
+            assert isinstance(row_camera_id, str), row_camera_id
+            yield QueryResult(frame_number, row_camera_id, filename, tuple(item_ids))
+
+    def _compile_predicate(
+        self,
+        predicate: "PredicateNode",
+        temporal: bool,
+    ) -> "tuple[Hashable, str, str]":
+        """
+        Returns the structural key of `predicate`, and its SELECT ... FROM ... JOIN clauses
+        and WHERE condition. Compiled predicates are cached by their structural key.
+        """
+        key = (structural_key(predicate), temporal, self.plan_joins)
+        if key in self._compiled_predicates:
+            self._compiled_predicates.move_to_end(key)
+            return key, *self._compiled_predicates[key]
+
         tables, _ = FindAllTablesVisitor()(predicate)
         tables = sorted(tables)
         mapping = {t: i for i, t in enumerate(tables)}
         predicate = normalize(predicate, temporal)
         predicate = MapTablesTransformer(mapping)(predicate)
         join_table = _join_table(temporal)
-
-        t_tables = ""
         t_outputs = ""
         for i in range(len(tables)):
-            t_tables += join_table(i)
             t_outputs += f",\n   t{i}.itemId"
 
-        sql_str = (
-            f"SELECT c0.frameNum, c0.cameraId, c0.filename{t_outputs}\n"
-            f"FROM Camera as c0\n{t_tables}"
-            f"WHERE {GenSqlVisitor()(predicate)}"
-        )
-        return [
-            QueryResult(frame_number, camera_id, filename, tuple(item_ids))
-            for frame_number, camera_id, filename, *item_ids in self.execute(sql_str)
-        ]
+        if self.plan_joins:
+            t_tables, where = _plan_joins(predicate, len(tables), temporal)
+        else:
+            t_tables = "FROM Camera as c0\n"
+            for i in range(len(tables)):
+                t_tables += join_table(i)
+            where = GenSqlVisitor()(predicate)
+        select = f"SELECT c0.frameNum, c0.cameraId, c0.filename{t_outputs}\n{t_tables}"
+
+        self._compiled_predicates[key] = select, where
+        if len(self._compiled_predicates) > PREDICATE_CACHE_SIZE:
+            self._compiled_predicates.popitem(last=False)
+        return key, select, where
+
+    def _predicate_sql(
+        self,
+        predicate: "PredicateNode",
+        temporal: bool,
+        camera_id: "str | None",
+    ) -> str:
+        _, select, where = self._compile_predicate(predicate, temporal)
+        if camera_id is not None:
+            where = f"c0.cameraId = {Literal(camera_id).as_string(self.connection)} AND {where}"
+        return f"{select}WHERE {where}"
+
+    def _execute_prepared(
+        self,
+        predicate: "PredicateNode",
+        temporal: bool,
+        camera_id: "str | None",
+    ) -> "list[tuple]":
+        """
+        Execute `predicate` as a prepared statement, parameterized by `camera_id` when given,
+        so that Postgres plans each distinct predicate only once per connection.
+        """
+        key, select, where = self._compile_predicate(predicate, temporal)
+        scoped = camera_id is not None
+        name = self._prepared_statements.get((key, scoped))
+        if name is None:
+            name = f"spatialyze_predicate_{next(_statement_ids)}"
+            if scoped:
+                self.update(
+                    f"PREPARE {name}(text) AS {select}WHERE c0.cameraId = $1 AND {where}",
+                    commit=False,
+                )
+            else:
+                self.update(f"PREPARE {name} AS {select}WHERE {where}", commit=False)
+            self._prepared_statements[(key, scoped)] = name
+            if len(self._prepared_statements) > PREDICATE_CACHE_SIZE:
+                _, evicted = self._prepared_statements.popitem(last=False)
+                self.update(f"DEALLOCATE {evicted}", commit=False)
+        else:
+            self._prepared_statements.move_to_end((key, scoped))
+
+        if scoped:
+            return self.execute(f"EXECUTE {name}(%s)", (camera_id,))
+        return self.execute(f"EXECUTE {name}")
 
     def sql(self, query: str) -> pd.DataFrame:
         results, cursor = self.execute_and_cursor(query)
@@ -317,6 +816,32 @@ class Database:
         cursor.close()
         return pd.DataFrame(results, columns=[d.name for d in description])
 
+    def sql_chunks(self, query: str, chunksize: int = ITERSIZE) -> "Iterator[pd.DataFrame]":
+        """
+        Execute a query with a server-side cursor and yield its results
+        as DataFrames of at most `chunksize` rows.
+        The cursor lives in the current transaction: do not commit before the iterator is exhausted.
+        """
+        cursor = self._named_cursor(chunksize)
+        try:
+            cursor.execute(query)
+            while True:
+                results = cursor.fetchmany(chunksize)
+                if len(results) == 0:
+                    break
+                description = cursor.description
+                assert description is not None
+                yield pd.DataFrame(results, columns=[d.name for d in description])
+        except psycopg2.errors.DatabaseError as error:
+            self._stream_error(error)
+        finally:
+            if not cursor.closed and not self.connection.closed:
+                cursor.close()
+
+
+_cursor_ids = itertools.count()
+_statement_ids = itertools.count()
+
 
 def _join_table(temporal: bool):
     if temporal:
@@ -336,6 +861,81 @@ def _join_table(temporal: bool):
     return join_table
 
 
+# Estimated fraction of rows kept by a condition, used to order joins
+SELECTIVITY: "dict[str, float]" = {
+    "eq": 0.1,
+    "ne": 0.9,
+    "like": 0.1,
+}
+DEFAULT_SELECTIVITY = 0.5
+_TABLE_ALIAS = re.compile(r"\b([ct])(\d+)\.")
+
+
+def _selectivity(node: "PredicateNode") -> float:
+    if isinstance(node, CompOpNode):
+        return SELECTIVITY.get(node.op, DEFAULT_SELECTIVITY)
+    if isinstance(node, CallNode):
+        return SELECTIVITY.get(node.name, DEFAULT_SELECTIVITY)
+    return DEFAULT_SELECTIVITY
+
+
+def _plan_joins(predicate: "PredicateNode", num_objects: int, temporal: bool) -> "tuple[str, str]":
+    """
+    Place each conjunct of a normalized `predicate` at the earliest point of the join:
+    - a condition on one object only filters that object's table before it is joined,
+    - a condition on one object and the camera is a join condition of that object's table,
+    - a condition on multiple objects is a join condition of the last of them to be joined,
+    - the rest (camera only) stays in the WHERE clause.
+    Objects are joined from the most to the least selective, as estimated from their conditions.
+    Tables are read off the generated SQL, as functions may refer to tables that are not
+    in their arguments (e.g. `convert_camera` uses the camera's heading).
+    Returns the FROM ... JOIN clauses and the WHERE condition.
+    """
+    if isinstance(predicate, BoolOpNode) and predicate.op == "and":
+        conjuncts = predicate.exprs
+    else:
+        conjuncts = [predicate]
+
+    filters: "list[list[str]]" = [[] for _ in range(num_objects)]
+    joins: "list[tuple[set[int], str]]" = []
+    wheres: "list[str]" = []
+    selectivities = [1.0] * num_objects
+    for conjunct in conjuncts:
+        sql = f"({GenSqlVisitor()(conjunct)})"
+        aliases = _TABLE_ALIAS.findall(sql)
+        objects = {int(i) for t, i in aliases if t == "t"}
+        camera = any(t == "c" for t, _ in aliases)
+        if len(objects) == 0:
+            wheres.append(sql)
+            continue
+
+        if len(objects) == 1:
+            (i,) = objects
+            selectivities[i] *= _selectivity(conjunct)
+            if not camera:
+                filters[i].append(sql)
+                continue
+        joins.append((objects, sql))
+
+    order = sorted(range(num_objects), key=lambda i: (selectivities[i], i))
+    position = {i: p for p, i in enumerate(order)}
+    conditions: "list[list[str]]" = [[] for _ in range(num_objects)]
+    for objects, sql in joins:
+        conditions[max(objects, key=position.__getitem__)].append(sql)
+
+    table = TRAJECTORY_TABLE if temporal else DETECTION_TABLE
+    tables = "FROM Camera as c0\n"
+    for i in order:
+        source = f"{table} AS t{i}"
+        if len(filters[i]) > 0:
+            source = f"(SELECT * FROM {source} WHERE {' AND '.join(filters[i])}) AS t{i}"
+        on = [f"c0.frameNum = t{i}.frameNum", f"c0.cameraId = t{i}.cameraId", *conditions[i]]
+        tables += f"JOIN {source} ON {' AND '.join(on)}\n"
+
+    where = " AND ".join(wheres) if len(wheres) > 0 else "TRUE"
+    return tables, where
+
+
 class _Config(NamedTuple):
     cameraId: str
     frameId: str
@@ -351,7 +951,7 @@ class _Config(NamedTuple):
     egoHeading: float
 
 
-def _config(config: CameraConfig) -> Composable:
+def _config(config: CameraConfig) -> _Config:
     cc = _Config(
         config.camera_id,
         config.frame_id,
@@ -371,18 +971,22 @@ def _config(config: CameraConfig) -> Composable:
     assert len(cc.cameraRotation) == 4, cc.cameraRotation
     assert isinstance(cc.egoRotation, list), cc.egoRotation
     assert len(cc.egoRotation) == 4, cc.egoRotation
-    row = map(Literal, cc)
-    return SQL("({})").format(SQL(",").join(row))
+    return cc
 
 
-### Do we still want to keep this??? Causes problems since if user uses a different port
-# will need to come in here to change
-database = Database(
-    psycopg2.connect(
+def connection_params() -> "dict[str, str]":
+    """
+    Returns the connection parameters configured by the AP_* environment variables.
+    """
+    return dict(
         dbname=environ.get("AP_DB", "postgres"),
         user=environ.get("AP_USER", "postgres"),
         host=environ.get("AP_HOST", "store"),
         port=environ.get("AP_PORT", "5432"),
         password=environ.get("AP_PASSWORD", "postgres"),
     )
-)
+
+
+# Default database, used when none is given (e.g. to World).
+# It only connects on first use, so importing this module does not require a running store.
+database = Database.connect(**connection_params())
@@ -1,5 +1,5 @@
 from inspect import signature
-from typing import Any, Callable, Generic, Literal, TypeVar
+from typing import Any, Callable, Generic, Hashable, Literal, TypeVar
 
 BinOp = Literal["add", "sub", "mul", "div", "matmul", "mod"]
 BoolOp = Literal["and", "or"]
@@ -445,6 +445,64 @@ def is_detection_only(node: "PredicateNode") -> bool:
     return IsDetectionOnly()(node)
 
 
+class StructuralKeyVisitor(Visitor[Hashable]):
+    """
+    Compute a hashable key that is equal for predicates with the same structure.
+    Predicates with the same key compile to the same SQL.
+    """
+
+    def visit_ArrayNode(self, node: "ArrayNode"):
+        return ("array", tuple(self(e) for e in node.exprs))
+
+    def visit_CompOpNode(self, node: "CompOpNode"):
+        return ("comp", node.op, self(node.left), self(node.right))
+
+    def visit_BinOpNode(self, node: "BinOpNode"):
+        return ("bin", node.op, self(node.left), self(node.right))
+
+    def visit_BoolOpNode(self, node: "BoolOpNode"):
+        return ("bool", node.op, tuple(self(e) for e in node.exprs))
+
+    def visit_UnaryOpNode(self, node: "UnaryOpNode"):
+        return ("unary", node.op, self(node.expr))
+
+    def visit_LiteralNode(self, node: "LiteralNode"):
+        value = node.value
+        try:
+            hash(value)
+        except TypeError:
+            value = repr(value)
+        # the type distinguishes values that are equal in Python but not in SQL (e.g. 1 and True)
+        return ("literal", type(node.value), value, node.python)
+
+    def visit_TableAttrNode(self, node: "TableAttrNode"):
+        return ("attr", node.name, self(node.table), node.shorten)
+
+    def visit_CallNode(self, node: "CallNode"):
+        params = tuple(self(p) for p in node.params)
+        named_params = tuple(sorted((k, self(v)) for k, v in node.named_params.items()))
+        return ("call", node.fn, params, named_params)
+
+    def visit_TableNode(self, node: "TableNode"):
+        return ("table", node.index)
+
+    def visit_ObjectTableNode(self, node: "ObjectTableNode"):
+        return ("object", node.index)
+
+    def visit_CameraTableNode(self, node: "CameraTableNode"):
+        return ("camera", node.index)
+
+    def visit_CastNode(self, node: "CastNode"):
+        return ("cast", node.to, self(node.expr))
+
+    def visit_AtTimeNode(self, node: "AtTimeNode"):
+        return ("attime", self(node.attr))
+
+
+def structural_key(node: "PredicateNode") -> "Hashable":
+    return StructuralKeyVisitor()(node)
+
+
 class MapTablesTransformer(BaseTransformer):
     mapping: "dict[int, int]"
 
@@ -1,4 +1,8 @@
+import hashlib
+import os
+
 from .database import Database
+from .utils.file_hash import file_hash
 from .utils.ingest_road import ROAD_TYPES, add_segment_type, ingest_location
 
 
@@ -11,3 +15,13 @@ class RoadNetwork:
         ingest_location(database, self.road_network_dir, self.location)
         add_segment_type(database, ROAD_TYPES)
         database._commit()
+
+    def fingerprint(self) -> "str":
+        """
+        Returns a hash of the location and the content of every file in the road network directory.
+        """
+        fingerprint = hashlib.sha256(self.location.encode())
+        for filename in sorted(os.listdir(self.road_network_dir)):
+            fingerprint.update(filename.encode())
+            fingerprint.update(file_hash(os.path.join(self.road_network_dir, filename)))
+        return fingerprint.hexdigest()
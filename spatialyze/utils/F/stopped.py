@@ -28,5 +28,7 @@ def stopped(visitor: GenSqlVisitor, args: list[PredicateNode], kwargs: dict[str,
     assert isinstance(point, ObjectTableNode), point
     point1 = dl(point)
 
-    nextPoint = f"(SELECT translation FROM Item_Trajectory WHERE itemId = {visitor(point.id)} AND {visitor(point.frameNum)} + ROUND({duration} * (SELECT fps FROM Spatialyze_Metadata)) = frameNum)"
+    cameraId = visitor(point.cameraId)
+    fps = f"(SELECT fps FROM Spatialyze_Metadata WHERE cameraId = {cameraId})"
+    nextPoint = f"(SELECT translation FROM Item_Trajectory WHERE itemId = {visitor(point.id)} AND cameraId = {cameraId} AND {visitor(point.frameNum)} + ROUND({duration} * {fps}) = frameNum)"
     return f"(EXIT {nextPoint} AND ST_Distance({visitor(point1)},{nextPoint})<{distance})"
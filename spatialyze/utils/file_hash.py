@@ -0,0 +1,21 @@
+import hashlib
+import os
+
+# (path, size, modification time) -> sha256 digest of the file
+_file_hashes: "dict[tuple[str, int, int], bytes]" = {}
+
+
+def file_hash(path: "str") -> "bytes":
+    """
+    Returns the sha256 digest of the content of the file at `path`.
+    Digests are memoized until the file is modified.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        _file_hashes[key] = digest.digest()
+    return _file_hashes[key]
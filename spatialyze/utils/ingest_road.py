@@ -163,6 +163,12 @@ CREATE TABLE IF NOT EXISTS Intersection(
 );
 """
 
+CREATE_FINGERPRINT_SQL = """
+CREATE TABLE IF NOT EXISTS RoadNetwork_Fingerprint(
+    fingerprint TEXT
+);
+"""
+
 
 def _remove_suffix(uid: str) -> "str | None":
     if uid is None:
@@ -189,6 +195,7 @@ def drop_tables(database: "Database"):
         "roadsection_lanesection",
         "intersection",
         "segmentpolygon",
+        "roadnetwork_fingerprint",
     ]
     drop_table = psql.SQL("DROP TABLE IF EXISTS {} CASCADE;")
 
@@ -264,9 +271,33 @@ def create_tables(database: "Database"):
     index("RoadSection_LaneSection", "laneSectionId")
     index("RoadSection_LaneSection", "roadSectionId")
 
+    database.update(CREATE_FINGERPRINT_SQL, commit=False)
+
     database._commit()
 
 
+def get_fingerprint(database: "Database") -> "str | None":
+    """
+    Returns the fingerprint of the road network currently ingested in the database,
+    or None if the road network was ingested without one.
+    """
+    if database.execute("SELECT to_regclass('RoadNetwork_Fingerprint') IS NULL")[0][0]:
+        return None
+    fingerprints = database.execute("SELECT fingerprint FROM RoadNetwork_Fingerprint")
+    if len(fingerprints) != 1:
+        return None
+    return fingerprints[0][0]
+
+
+def set_fingerprint(database: "Database", fingerprint: "str"):
+    database.update("DELETE FROM RoadNetwork_Fingerprint;", commit=False)
+    database.update(
+        psql.SQL("INSERT INTO RoadNetwork_Fingerprint VALUES ({});").format(
+            psql.Literal(fingerprint)
+        )
+    )
+
+
 def insert_polygon(database: "Database", polygons: "list[dict]"):
     ids = set([p["id"].split("_")[0] for p in polygons if len(p["id"].split("_")) == 1])
 
@@ -1,3 +1,5 @@
+from typing import Iterable, TypeVar
+
 import torch
 
 from spatialyze.predicate import (
@@ -22,16 +24,26 @@ from .detection_2d import Detection2D, Metadatum
 
 
 class ObjectTypeFilter(Detection2D):
+    """
+    Keep the detections of `types`, or of the types that the objects of `predicate` can have.
+    When the predicate does not restrict the type of one of its objects (see `object_types`),
+    `types` is None and all detections are kept.
+    """
+
+    types: "list[str] | None"
+
     def __init__(self, types: "list[str] | None" = None, predicate: "PredicateNode | None" = None):
         if types is None:
             assert predicate is not None, "Can only except either types or predicate"
-            self.types = list(FindType()(predicate))
+            _types = object_types(predicate)
+            self.types = None if _types is None else list(_types)
         else:
             assert types is not None, "Can only except either types or predicate"
             self.types = types
 
     def __repr__(self) -> str:
-        return f"ObjectTypeFilter(types={sorted(self.types)})"
+        types = None if self.types is None else sorted(self.types)
+        return f"ObjectTypeFilter(types={types})"
 
     def _run(self, payload: "Payload"):
         detection_2d = Detection2D.get(payload)
@@ -43,11 +55,10 @@ class ObjectTypeFilter(Detection2D):
             # TODO: class_mapping should not be a dict
             class_mapping = list(class_mapping.values())
         assert isinstance(class_mapping, list)
-        type_indices_to_keep: "set[int]" = set()
-
-        for t in self.types:
-            idx = class_mapping.index(t)
-            type_indices_to_keep.add(idx)
+        if self.types is None:
+            mask = torch.ones(len(class_mapping), dtype=torch.bool)
+        else:
+            mask = type_mask(self.types, class_mapping)
 
         metadata = []
         for keep, (det, _, ids) in zip(payload.keep, detection_2d):
@@ -55,22 +66,119 @@ class ObjectTypeFilter(Detection2D):
                 metadata.append(Metadatum(torch.Tensor([]), class_mapping, []))
                 continue
 
-            det_to_keep: "list[int]" = []
-            if len(det) > 0:
-                type_indices = det[:, 5]
-                type_indices_list: "list[float]" = type_indices.tolist()
-                for i, type_index in enumerate(type_indices_list):
-                    assert isinstance(type_index, float)
-                    assert type_index.is_integer()
-                    if type_index in type_indices_to_keep:
-                        det_to_keep.append(i)
-
-            metadata.append(
-                Metadatum(det[det_to_keep], class_mapping, [ids[k] for k in det_to_keep])
-            )
+            det, ids = filter_types(det, ids, mask)
+            metadata.append(Metadatum(det, class_mapping, ids))
         return None, {ObjectTypeFilter.classname(): metadata}
 
 
+def type_mask(types: "Iterable[str]", class_mapping: "list[str]") -> "torch.Tensor":
+    """
+    Returns a lookup of whether each class index of `class_mapping` is one of `types`.
+    """
+    mask = torch.zeros(len(class_mapping), dtype=torch.bool)
+    mask[[class_mapping.index(t) for t in types]] = True
+    return mask
+
+
+_T = TypeVar("_T")
+
+
+def filter_types(
+    det: "torch.Tensor",
+    ids: "list[_T]",
+    mask: "torch.Tensor",
+) -> "tuple[torch.Tensor, list[_T]]":
+    """
+    Returns the detections in `det` (with their ids) of the classes in the lookup `mask`.
+    """
+    if len(det) == 0:
+        return det, ids
+    keep = mask.to(det.device)[det[:, 5].long()]
+    return det[keep], [i for i, k in zip(ids, keep.tolist()) if k]
+
+
+def object_types(predicate: "PredicateNode") -> "set[str] | None":
+    """
+    Returns the types that the objects of `predicate` must have for the predicate to hold,
+    or None if the predicate does not restrict the type of one of its objects
+    (e.g. `F.like(o.type, "vehicle%")`, `o.type != "car"` or `(o.type == "car") | (o.speed > 1)`).
+    """
+    visitor = ObjectTypeConstraints()
+    constraints = visitor(predicate)
+    if len(visitor.tables) == 0 or any(t not in constraints for t in visitor.tables):
+        return None
+    return set().union(*(constraints[t] for t in visitor.tables))
+
+
+class ObjectTypeConstraints(Visitor["dict[int, set[str]]"]):
+    """
+    Computes, for each object (indexed by its table) whose type is restricted by a predicate,
+    the types that the object must have for the predicate to hold.
+    Objects that are not restricted can have any type.
+    Only equality to a literal and `F.has_types` restrict the type of an object;
+    the constraints are intersected across "and" and unioned across "or".
+    """
+
+    tables: "set[int]"
+
+    def __init__(self) -> None:
+        super().__init__()
+        # objects referenced in the predicate
+        self.tables = set()
+
+    def __call__(self, node: "PredicateNode") -> "dict[int, set[str]]":
+        # visitors of nodes that do not restrict the type of an object return None
+        return super().__call__(node) or {}
+
+    def visit_CompOpNode(self, node: "CompOpNode") -> "dict[int, set[str]]":
+        self(node.left)
+        self(node.right)
+        if node.op != "eq":
+            return {}
+        for attr, value in [(node.left, node.right), (node.right, node.left)]:
+            if (
+                isinstance(attr, TableAttrNode)
+                and attr.name == "objectType"
+                and isinstance(attr.table, ObjectTableNode)
+                and isinstance(value, LiteralNode)
+                and isinstance(value.value, str)
+            ):
+                return {attr.table.index: {value.value}}
+        return {}
+
+    def visit_BoolOpNode(self, node: "BoolOpNode") -> "dict[int, set[str]]":
+        constraints = [self(e) for e in node.exprs]
+        if node.op == "and":
+            merged: "dict[int, set[str]]" = {}
+            for c in constraints:
+                for table, types in c.items():
+                    merged[table] = merged[table] & types if table in merged else set(types)
+            return merged
+
+        # an object is only restricted if every operand of "or" restricts it
+        tables = set.intersection(*(set(c) for c in constraints)) if constraints else set()
+        return {t: set().union(*(c[t] for c in constraints)) for t in tables}
+
+    def visit_CallNode(self, node: "CallNode") -> "dict[int, set[str]]":
+        for p in [*node.params, *node.named_params.values()]:
+            self(p)
+        if node.name != "has_types" or len(node.params) < 2:
+            return {}
+
+        obj, *types = node.params
+        if len(types) == 1 and isinstance(types[0], ArrayNode):
+            types = types[0].exprs
+        if not isinstance(obj, ObjectTableNode) or not all(
+            isinstance(t, LiteralNode) and isinstance(t.value, str) for t in types
+        ):
+            return {}
+        return {obj.index: {t.value for t in types if isinstance(t, LiteralNode)}}
+
+    def visit_ObjectTableNode(self, node: "ObjectTableNode") -> "dict[int, set[str]]":
+        self.tables.add(node.index)
+        return {}
+
+
 class FindType(Visitor["set[str]"]):
     def __init__(self) -> None:
         super().__init__()
@@ -1,13 +1,13 @@
 import logging
 import time
-from typing import Callable, List
+from typing import TYPE_CHECKING, Callable, List
 
 import postgis
 import torch
 from bitarray import bitarray
 from psycopg2 import sql
 
-from ....database import database
+from ....database import database as default_database
 from ...camera_config import CameraConfig
 from ...payload import Payload
 from ...types import DetectionId, obj_detection
@@ -25,6 +25,9 @@ from .detection_estimation import (
 )
 from .utils import get_ego_avg_speed, trajectory_3d
 
+if TYPE_CHECKING:
+    from ....database import Database
+
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARN)
@@ -34,8 +37,13 @@ DetectionEstimationMetadatum = List[DetectionInfo]
 
 
 class DetectionEstimation(Stage[DetectionEstimationMetadatum]):
-    def __init__(self, predicate: "Callable[[DetectionInfo], bool]" = lambda _: True):
+    def __init__(
+        self,
+        predicate: "Callable[[DetectionInfo], bool]" = lambda _: True,
+        database: "Database | None" = None,
+    ):
         self.predicates = [predicate]
+        self.database = database
         self._benchmark = []
         super(DetectionEstimation, self).__init__()
 
@@ -56,7 +64,8 @@ class DetectionEstimation(Stage[DetectionEstimationMetadatum]):
         if ego_speed < 2:
             return keep, {DetectionEstimation.classname(): [[]] * len(keep)}
 
-        ego_views = get_ego_views(payload.video)
+        database = self.database or default_database
+        ego_views = get_ego_views(payload.video, database)
         # ego_views: list[shapely.geometry.Polygon] = [shapely.wkb.loads(view.to_ewkb(), hex=True) for view in ego_views]
 
         skipped_frame_num = []
@@ -94,7 +103,7 @@ class DetectionEstimation(Stage[DetectionEstimationMetadatum]):
             start_detection_time = time.time()
             logger.info(f"current frame num {i}")
             all_detection_info, times = construct_estimated_all_detection_info(
-                det, dids, current_ego_config, ego_trajectory
+                det, dids, current_ego_config, ego_trajectory, database
             )
             total_detection_time.append(
                 (time.time() - start_detection_time, len(det), len(all_detection_info), times)
@@ -181,7 +190,7 @@ def objects_count_change(dets: "list[D3DMetadatum]", cur: "int", nxt: "int"):
     return nxt
 
 
-def get_ego_views(video: "Video") -> "list[postgis.Polygon]":
+def get_ego_views(video: "Video", database: "Database") -> "list[postgis.Polygon]":
     indices, view_areas = get_views(video, distance=100)
     views_raw = database.execute(
         sql.SQL(
@@ -243,6 +252,7 @@ def construct_estimated_all_detection_info(
     detection_ids: "list[DetectionId]",
     ego_config: "CameraConfig",
     ego_trajectory: "list[trajectory_3d]",
+    database: "Database",
 ) -> "tuple[list[DetectionInfo], list[float]]":
     _times = time.time()
     all_detections = []
@@ -265,6 +275,6 @@ def construct_estimated_all_detection_info(
         car_bbox3d = ((lx, ly, lz), (rx, ry, rz))
         all_detections.append(obj_detection(did, car_loc3d, car_loc2d, car_bbox3d, car_bbox2d))
     all_detection_info, times = construct_all_detection_info(
-        ego_config, ego_trajectory, all_detections
+        ego_config, ego_trajectory, all_detections, database
     )
     return all_detection_info, [_times] + times
@@ -21,6 +21,7 @@ TODO:
 import datetime
 import time
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
 import postgis
 import shapely
@@ -38,6 +39,9 @@ from .utils import (
     trajectory_3d,
 )
 
+if TYPE_CHECKING:
+    from ....database import Database
+
 # MAX_SKIP = 5
 MAX_SKIP = 1000
 
@@ -261,13 +265,16 @@ def construct_all_detection_info(
     ego_config: "CameraConfig",
     ego_trajectory: "list[trajectory_3d]",
     all_detections: "list[obj_detection]",
+    database: "Database",
 ) -> tuple[list[DetectionInfo], list[float]]:
     all_detection_info: "list[DetectionInfo]" = []
     if len(all_detections) == 0:
         return all_detection_info, []
 
     # ego_road_polygon_info = get_largest_polygon_containing_point(ego_config)
-    detections_polygon_mapping, times = get_detection_polygon_mapping(all_detections, ego_config)
+    detections_polygon_mapping, times = get_detection_polygon_mapping(
+        all_detections, ego_config, database
+    )
     if len(detections_polygon_mapping) == 0:
         return all_detection_info, times
 
@@ -15,7 +15,7 @@ mapping = map_imgsegment_roadsegment(test_config)
 import array
 import math
 import time
-from typing import NamedTuple, Tuple
+from typing import TYPE_CHECKING, NamedTuple, Tuple
 
 import numpy as np
 import postgis
@@ -23,11 +23,13 @@ import psycopg2.sql as sql
 import shapely.geometry as sg
 import shapely.wkb as swkb
 
-from ....database import database
 from ...camera_config import CameraConfig
 from ...types import DetectionId, Float22, obj_detection
 from .utils import ROAD_TYPES
 
+if TYPE_CHECKING:
+    from ....database import Database
+
 SQL_ROAD_TYPES = ",".join("__RoadType__" + rt + "__" for rt in ROAD_TYPES)
 USEFUL_TYPES = ["lane", "lanegroup", "intersection"]
 
@@ -89,7 +91,11 @@ def reformat_return_polygon(segments: "list[RoadSegmentWithHeading]") -> "list[S
     return list(map(_, segments))
 
 
-def map_detections_to_segments(detections: "list[obj_detection]", ego_config: "CameraConfig"):
+def map_detections_to_segments(
+    detections: "list[obj_detection]",
+    ego_config: "CameraConfig",
+    database: "Database",
+):
     tokens = [*map(lambda x: x.detection_id.obj_order, detections)]
     points = [postgis.Point(d.car_loc3d[0], d.car_loc3d[1]) for d in detections]
 
@@ -183,14 +189,18 @@ def get_fov_lines(ego_config: "CameraConfig", ego_fov: float = 70.0) -> "tuple[F
     return left_fov_line, right_fov_line
 
 
-def get_detection_polygon_mapping(detections: "list[obj_detection]", ego_config: "CameraConfig"):
+def get_detection_polygon_mapping(
+    detections: "list[obj_detection]",
+    ego_config: "CameraConfig",
+    database: "Database",
+):
     """
     Given a list of detections, return a list of RoadSegmentWithHeading
     """
     # start_time = time.time()
     times: list[float] = []
     times.append(time.time())
-    results = map_detections_to_segments(detections, ego_config)
+    results = map_detections_to_segments(detections, ego_config, database)
     times.append(time.time())
 
     order_ids, mapped_polygons = [r[0] for r in results], [r[1:] for r in results]
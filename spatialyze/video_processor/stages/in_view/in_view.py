@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
 import numpy as np
 import numpy.typing as npt
@@ -7,7 +7,7 @@ from postgis import MultiPoint
 from psycopg2 import sql
 from pyquaternion import Quaternion
 
-from ....database import database
+from ....database import database as default_database
 from ....predicate import (
     ArrayNode,
     BaseTransformer,
@@ -31,6 +31,9 @@ from ...payload import Payload
 from ...video import Video
 from ..stage import Stage
 
+if TYPE_CHECKING:
+    from ....database import Database
+
 OTHER_ROAD_TYPES = {
     "roadsection": ["road", "intersection"],
     "lane": ["lanegroup", "road", "roadsection", "intersection"],
@@ -46,9 +49,11 @@ class InView(Stage):
         distance: float,
         roadtypes: "str | list[str] | None" = None,
         predicate: "PredicateNode | None" = None,
+        database: "Database | None" = None,
     ):
         super().__init__()
         self.distance = distance
+        self.database = database
         assert (
             roadtypes is not None or predicate is not None
         ), "At least one of roadtypes or predicate must be specified"
@@ -66,6 +71,7 @@ class InView(Stage):
 
     def _run(self, payload: "Payload") -> "tuple[bitarray, None]":
         indices, view_areas = get_views(payload.video, self.distance)
+        database = self.database or default_database
 
         keep = bitarray(len(payload.keep))
         keep.setall(1)
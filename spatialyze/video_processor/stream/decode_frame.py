@@ -1,18 +1,129 @@
+from collections.abc import Iterable, Iterator
+
 import cv2
+import numpy as np
 import numpy.typing as npt
 
+from ...utils.file_hash import file_hash
+from ..utils.disk_cache import DiskCache
 from ..video import Video
+from .data_types import Skip, skip
 from .stream import Stream
 
 
 class DecodeFrame(Stream[npt.NDArray]):
+    """
+    Decode the frames of a video.
+    Frames are shared by all consumers without being copied, so they are read-only;
+    a consumer that modifies a frame should modify its own copy.
+    With a `pruner`, only the frames it keeps (True) are converted into arrays,
+    and other frames are skipped; pruned frames are grabbed without being retrieved,
+    or sought over when at least `seek_threshold` consecutive frames are pruned.
+    Seeking is frame-accurate only for videos that OpenCV can seek precisely.
+    With a `cache`, decoded frames are stored by the content of the video,
+    and cached frames are not decoded again.
+    """
+
+    def __init__(
+        self,
+        pruner: "Stream[bool] | None" = None,
+        hw_acceleration: bool = False,
+        seek_threshold: "int | None" = None,
+        cache: "DiskCache | None" = None,
+    ):
+        self.pruner = pruner
+        self.hw_acceleration = hw_acceleration
+        self.seek_threshold = seek_threshold
+        self.cache = cache
+
     def _stream(self, video: Video):
-        cap = cv2.VideoCapture(video.videofile)
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            yield frame
+        cap = open_video(video.videofile, self.hw_acceleration)
+        namespace = None if self.cache is None else frames_namespace(video)
+
+        keeps: "Iterable[bool | Skip] | None" = None
+        if self.pruner is not None:
+            keeps = self.pruner.stream(video)
+        elif self.cache is not None and namespace is not None:
+            length = self.cache.get(namespace, "length")
+            if length is not None:
+                keeps = (True for _ in range(int(length[0])))
+
+        if keeps is None:
+            count = 0
+            while cap.isOpened():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if self.cache is not None and namespace is not None:
+                    self.cache.put(namespace, count, frame)
+                count += 1
+                yield read_only(frame)
+            if self.cache is not None and namespace is not None:
+                self.cache.put(namespace, "length", np.array([count]))
+        else:
+            yield from self._decode_kept(cap, keeps, video, namespace)
         cap.release()
         cv2.destroyAllWindows()
         self.end()
+
+    def _decode_kept(
+        self,
+        cap,
+        keeps: "Iterable[bool | Skip]",
+        video: Video,
+        namespace: "str | None",
+    ) -> "Iterator[npt.NDArray | Skip]":
+        # index of the next frame of `cap`; frames before the next decoded frame are skipped
+        # only when it is decoded, so pruned and cached frames at the end are never decoded.
+        position = 0
+        for idx, keep in enumerate(keeps):
+            if keep is not True:
+                yield skip
+                continue
+
+            frame = None
+            if self.cache is not None and namespace is not None:
+                frame = self.cache.get(namespace, idx)
+            if frame is None:
+                self._skip_frames(cap, position, idx - position, video)
+                ret, frame = cap.read()
+                assert ret, f"{video.videofile} has fewer frames than its pruner"
+                position = idx + 1
+                if self.cache is not None and namespace is not None:
+                    self.cache.put(namespace, idx, frame)
+            yield read_only(frame)
+
+    def _skip_frames(self, cap, position: int, count: int, video: Video):
+        if count == 0:
+            return
+        if self.seek_threshold is not None and count >= self.seek_threshold:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position + count)
+            return
+        for _ in range(count):
+            assert cap.grab(), f"{video.videofile} has fewer frames than its pruner"
+
+
+def frames_namespace(video: Video) -> str:
+    """
+    Returns the DiskCache namespace of the decoded frames of `video`.
+    """
+    return f"frames-{file_hash(video.videofile).hex()}"
+
+
+def read_only(frame: npt.NDArray) -> npt.NDArray:
+    frame.flags.writeable = False
+    return frame
+
+
+def open_video(videofile: str, hw_acceleration: bool = False):
+    """
+    Open `videofile`, decoding with any available hardware acceleration when `hw_acceleration`.
+    OpenCV decodes in software if no hardware decoder supports the video.
+    """
+    if not hw_acceleration:
+        return cv2.VideoCapture(videofile)
+    return cv2.VideoCapture(
+        videofile,
+        cv2.CAP_ANY,
+        [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY],
+    )
@@ -58,13 +58,21 @@ NN_BUDGET = "NN_BUDGET"
 
 
 class DeepSORT(Stream[list[TrackingResult]]):
+    """
+    Track detections with DeepSORT.
+    `batch_size` is accepted for the same interface as StrongSORT, but DeepSORT extracts the
+    ReID features of each frame's detections separately, so it does not batch them.
+    """
+
     def __init__(
         self,
         detections: Stream[Detection2D] | Stream[Detection3D],
         frames: Stream[npt.NDArray],
+        batch_size: int = 1,
     ):
         self.detection2ds = detections
         self.frames = frames
+        self.batch_size = batch_size
 
     def _stream(self, video: Video):
         with torch.no_grad():
@@ -107,7 +115,8 @@ class DeepSORT(Stream[list[TrackingResult]]):
                         classes = _classes
 
                     assert not isinstance(im0s, Skip), type(im0s)
-                    im0 = im0s.copy()
+                    # the tracker only reads the frame
+                    im0 = im0s
 
                     xywhs = xyxy2xywh(det[:, 0:4])
                     assert isinstance(xywhs, torch.Tensor), type(xywhs)
@@ -1,8 +1,9 @@
 import logging
 import time
 from collections.abc import Iterable, Iterator
-from typing import Generic, TypeVar
+from typing import TYPE_CHECKING, Generic, TypeVar
 
+from ...database import database as default_database
 from ..stages.detection_estimation import (
     construct_estimated_all_detection_info,
     generate_sample_plan_once,
@@ -14,14 +15,18 @@ from ..video import Video
 from .data_types import Detection3D, Skip
 from .stream import Stream
 
+if TYPE_CHECKING:
+    from ...database import Database
+
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARN)
 
 
 class ExitFrameSampler(Stream[bool]):
-    def __init__(self, detections: Stream[Detection3D]):
+    def __init__(self, detections: Stream[Detection3D], database: "Database | None" = None):
         self.detections = detections
+        self.database = database
 
     def _stream(self, video: Video):
         start_time = time.time()
@@ -32,7 +37,8 @@ class ExitFrameSampler(Stream[bool]):
         if ego_speed < 2:
             return self.detections.stream(video)
 
-        ego_views = get_ego_views(video)
+        database = self.database or default_database
+        ego_views = get_ego_views(video, database)
         # ego_views = [shapely.wkb.loads(view.to_ewkb(), hex=True) for view in ego_views]
 
         skipped_frame_num = []
@@ -63,7 +69,7 @@ class ExitFrameSampler(Stream[bool]):
             start_detection_time = time.time()
             logger.info(f"current frame num {i}")
             all_detection_info, times = construct_estimated_all_detection_info(
-                det, dids, config, ego_trajectory
+                det, dids, config, ego_trajectory, database
             )
             total_detection_time.append(
                 (time.time() - start_detection_time, len(det), len(all_detection_info), times)
@@ -1,8 +1,10 @@
 import cv2
+import numpy as np
 import numpy.typing as npt
 
 from ..video import Video
 from .data_types import Skip, skip
+from .decode_frame import read_only
 from .stream import Stream
 
 
@@ -12,5 +14,10 @@ class LoadImages(Stream[npt.NDArray]):
 
     def _stream(self, video: Video):
         for filename in self.frames.stream(video):
-            yield (skip if isinstance(filename, Skip) else cv2.imread(filename))
+            if isinstance(filename, Skip):
+                yield skip
+                continue
+            image = cv2.imread(filename)
+            assert image is not None, filename
+            yield read_only(np.asarray(image))
         self.end()
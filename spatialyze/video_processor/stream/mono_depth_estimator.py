@@ -4,43 +4,50 @@ import torch
 from torchvision import transforms
 
 from ..modules.monodepth2.monodepth2.layers import disp_to_depth
-from ..stages.depth_estimation import monodepth
+from ..stages.depth_estimation import MODEL_NAMES, monodepth
 from ..video import Video
-from .data_types import Skip, skip
 from .stream import Stream
 
 
 class MonoDepthEstimator(Stream[npt.NDArray]):
-    def __init__(self, frames: Stream[npt.NDArray]):
+    def __init__(self, frames: Stream[npt.NDArray], batch_size: int = 1):
         self.frames = frames
+        self.batch_size = batch_size
 
     def _stream(self, video: Video):
         with torch.no_grad():
-            md = monodepth()
-            for img in self.frames.stream(video):
-                if isinstance(img, Skip):
-                    yield skip
-                    continue
-
-                # Load image and preprocess
-                input_image = Image.fromarray(img[:, :, [2, 1, 0]])
-                original_width, original_height = input_image.size
-                input_image = input_image.resize(
-                    (md.feed_width, md.feed_height), Image.Resampling.LANCZOS
-                )
-                input_image = transforms.ToTensor()(input_image).unsqueeze(0)
-
-                # PREDICTION
-                input_image = input_image.to(md.device)
-                features = md.encoder(input_image)
-                outputs = md.depth_decoder(features)
-
-                disp = outputs[("disp", 0)]
-
-                _, depth = disp_to_depth(disp, 0.1, 100)
-                depth_resized = torch.nn.functional.interpolate(
-                    depth, (original_height, original_width), mode="bilinear", align_corners=False
-                )
-
-                yield depth_resized.squeeze().cpu().detach().numpy() * 5.4
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            md = self._load_model(("monodepth", MODEL_NAMES[2], device), monodepth)
+            yield from self._batched(
+                self.frames.stream(video), self.batch_size, lambda b: _estimate(md, b)
+            )
         self.end()
+
+
+def _estimate(md: "monodepth", imgs: "list[npt.NDArray]") -> "list[npt.NDArray]":
+    assert len(imgs) > 0
+    # frames of the same video have the same size
+    original_height, original_width = imgs[0].shape[:2]
+
+    # Load images and preprocess
+    input_images = []
+    for img in imgs:
+        input_image = Image.fromarray(img[:, :, [2, 1, 0]])
+        input_image = input_image.resize((md.feed_width, md.feed_height), Image.Resampling.LANCZOS)
+        input_images.append(transforms.ToTensor()(input_image))
+    input_image = torch.stack(input_images)
+
+    # PREDICTION
+    input_image = input_image.to(md.device)
+    features = md.encoder(input_image)
+    outputs = md.depth_decoder(features)
+
+    disp = outputs[("disp", 0)]
+
+    _, depth = disp_to_depth(disp, 0.1, 100)
+    depth_resized = torch.nn.functional.interpolate(
+        depth, (original_height, original_width), mode="bilinear", align_corners=False
+    )
+
+    depths = depth_resized.cpu().detach().numpy() * 5.4
+    return [d.squeeze() for d in depths]
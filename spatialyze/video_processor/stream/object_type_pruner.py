@@ -1,5 +1,11 @@
+import torch
+
 from ...predicate import PredicateNode
-from ..stages.detection_2d.object_type_filter import ObjectTypeFilter
+from ..stages.detection_2d.object_type_filter import (
+    ObjectTypeFilter,
+    filter_types,
+    type_mask,
+)
 from ..video import Video
 from .data_types import Detection2D, Skip, skip
 from .stream import Stream
@@ -17,7 +23,7 @@ class ObjectTypePruner(Stream[Detection2D]):
         self.types = self.object_type_filter.types
 
     def _stream(self, video: Video):
-        type_indices_to_keep: set[int] | None = None
+        mask: torch.Tensor | None = None
 
         for detection_2d in self.detections.stream(video):
             if isinstance(detection_2d, Skip):
@@ -25,24 +31,13 @@ class ObjectTypePruner(Stream[Detection2D]):
                 continue
 
             det, class_mapping, ids = detection_2d
-            if len(det) == 0:
+            if len(det) == 0 or self.types is None:
                 yield detection_2d
                 continue
 
-            if type_indices_to_keep is None:
-                type_indices_to_keep = set()
-                for t in self.types:
-                    idx = class_mapping.index(t)
-                    type_indices_to_keep.add(idx)
-
-            det_to_keep: list[int] = []
-            type_indices = det[:, 5]
-            type_indices_list: list[float] = type_indices.tolist()
-            for i, type_index in enumerate(type_indices_list):
-                assert isinstance(type_index, float), type(type_index)
-                assert type_index.is_integer()
-                if type_index in type_indices_to_keep:
-                    det_to_keep.append(i)
-
-            yield Detection2D(det[det_to_keep], class_mapping, [ids[k] for k in det_to_keep])
+            if mask is None:
+                mask = type_mask(self.types, class_mapping).to(det.device)
+
+            det, ids = filter_types(det, ids, mask)
+            yield Detection2D(det, class_mapping, ids)
         self.end()
@@ -0,0 +1,285 @@
+import multiprocessing
+import os
+from collections import deque
+from collections.abc import Iterator
+from contextlib import closing
+from multiprocessing import resource_tracker
+from multiprocessing.pool import AsyncResult
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+from ..utils.disk_cache import DiskCache
+from ..video import Video
+from .data_types import skip
+from .decode_frame import DecodeFrame, frames_namespace, open_video, read_only
+from .stream import Stream
+
+# Default number of frames decoded by each task, a multiple of common GOP lengths
+CHUNK_SIZE = 60
+# Directory of the files backing POSIX shared memory blocks on Linux
+SHM_DIR = "/dev/shm"
+
+
+class _Chunk(NamedTuple):
+    # name of the shared memory block holding the frames, None if no frame is decoded
+    shm: "str | None"
+    num_frames: int
+    shape: "tuple[int, ...]"
+    dtype: str
+
+
+_EMPTY = _Chunk(None, 0, (), "")
+
+# kept frames of a chunk, its cached frames,
+# and the chunk's decoding task if any kept frame is not cached
+_Pending = tuple[list[bool], list["npt.NDArray | None"], AsyncResult[_Chunk] | None]
+
+
+class ParallelDecodeFrame(DecodeFrame):
+    """
+    Decode chunks of `chunk_size` consecutive frames in a pool of `workers` processes.
+    Up to `window` chunks are decoded ahead of the consumers;
+    each worker writes its chunk into a shared memory block, so frames are not pickled,
+    and on Linux frames are yielded as views of the block, without being copied.
+    Frames are yielded in order.
+    With a `pruner`, workers only retrieve the frames it keeps,
+    and chunks without any kept frame are not decoded.
+    With a `cache`, cached frames are read from the cache, decoded frames are stored in it,
+    and chunks without any frame to decode are not decoded.
+
+    Workers seek to the first frame of their chunk; `chunk_size` should be a multiple of the
+    video's GOP length so that each chunk starts at a keyframe.
+    """
+
+    def __init__(
+        self,
+        pruner: "Stream[bool] | None" = None,
+        workers: "int | None" = None,
+        chunk_size: int = CHUNK_SIZE,
+        window: "int | None" = None,
+        hw_acceleration: bool = False,
+        cache: "DiskCache | None" = None,
+    ):
+        super().__init__(pruner, hw_acceleration, cache=cache)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.window = window or 2 * self.workers
+        assert self.workers > 0, self.workers
+        assert self.chunk_size > 0, self.chunk_size
+        assert self.window > 0, self.window
+
+    def _stream(self, video: Video):
+        namespace = None if self.cache is None else frames_namespace(video)
+        keeps = self._keeps(video, namespace)
+        # workers share the tracker of this process, which unlinks leaked shared memory on exit
+        resource_tracker.ensure_running()
+        with multiprocessing.get_context("fork").Pool(self.workers) as pool:
+            chunks: "deque[_Pending]" = deque()
+            start = 0
+            # number of frames of the video, once its last chunk is decoded
+            length: "int | None" = None
+
+            def submit():
+                nonlocal start
+                keep = next(keeps, None)
+                if keep is None:
+                    return
+                cached = self._cached(namespace, start, keep)
+                decode = [k and c is None for k, c in zip(keep, cached)]
+                args = video.videofile, self.hw_acceleration, start, decode
+                result = pool.apply_async(_decode_chunk, args) if any(decode) else None
+                chunks.append((keep, cached, result))
+                start += len(keep)
+
+            try:
+                for _ in range(self.window):
+                    submit()
+
+                index = 0
+                while len(chunks) > 0 and length is None:
+                    keep, cached, result = chunks.popleft()
+                    chunk = _EMPTY if result is None else result.get()
+                    with closing(_read_chunk(chunk)) as frames:
+                        for k, frame in zip(keep, cached):
+                            if not k:
+                                yield skip
+                            elif frame is not None:
+                                yield read_only(frame)
+                            else:
+                                frame = next(frames, None)
+                                if frame is None:
+                                    assert (
+                                        self.pruner is None
+                                    ), f"{video.videofile} has fewer frames than its pruner"
+                                    # the video ended in this chunk
+                                    length = index
+                                    break
+                                if self.cache is not None and namespace is not None:
+                                    self.cache.put(namespace, index, frame)
+                                yield frame
+                            index += 1
+                    if length is None:
+                        submit()
+
+                if self.cache is not None and namespace is not None and length is not None:
+                    self.cache.put(namespace, "length", np.array([length]))
+
+                # chunks after the end of the video should not decode any frame
+                while len(chunks) > 0:
+                    _, _, result = chunks.popleft()
+                    assert result is not None
+                    chunk = result.get()
+                    _release(chunk)
+                    assert chunk.num_frames == 0, f"{video.videofile} has missing frames"
+            finally:
+                # release the chunks of an abandoned or failed iteration
+                for _, _, result in chunks:
+                    if result is None:
+                        continue
+                    result.wait()
+                    if result.successful():
+                        _release(result.get())
+        self.end()
+
+    def _cached(
+        self, namespace: "str | None", start: int, keep: "list[bool]"
+    ) -> "list[npt.NDArray | None]":
+        """
+        Returns the cached frames of a chunk that starts at frame `start`, None if not cached.
+        """
+        if self.cache is None or namespace is None:
+            return [None] * len(keep)
+        return [self.cache.get(namespace, start + i) if k else None for i, k in enumerate(keep)]
+
+    def _keeps(self, video: Video, namespace: "str | None") -> "Iterator[list[bool]]":
+        """
+        Split the frames kept by the pruner into chunks.
+        Without a pruner, all frames are kept until the end of the video,
+        or until its cached length.
+        """
+        if self.pruner is None:
+            length = None
+            if self.cache is not None and namespace is not None:
+                length = self.cache.get(namespace, "length")
+            if length is None:
+                while True:
+                    yield [True] * self.chunk_size
+            else:
+                for start in range(0, int(length[0]), self.chunk_size):
+                    yield [True] * min(self.chunk_size, int(length[0]) - start)
+                return
+
+        keep: "list[bool]" = []
+        for k in self.pruner.stream(video):
+            keep.append(k is True)
+            if len(keep) == self.chunk_size:
+                yield keep
+                keep = []
+        if len(keep) > 0:
+            yield keep
+
+
+def _decode_chunk(
+    videofile: str,
+    hw_acceleration: bool,
+    start: int,
+    keep: "list[bool]",
+) -> "_Chunk":
+    cap = open_video(videofile, hw_acceleration)
+    assert cap.isOpened(), videofile
+    if start > 0:
+        cap = _seek(cap, videofile, hw_acceleration, start)
+
+    size = keep.count(True)
+    shm: "SharedMemory | None" = None
+    frames: "npt.NDArray | None" = None
+    count = 0
+    try:
+        for k in keep:
+            if not k:
+                # pruned frames are decoded but not converted into arrays
+                if not cap.grab():
+                    break
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if shm is None:
+                shm = SharedMemory(create=True, size=frame.nbytes * size)
+                frames = np.ndarray((size, *frame.shape), dtype=frame.dtype, buffer=shm.buf)
+            assert frames is not None
+            frames[count] = frame
+            count += 1
+    except BaseException:
+        if shm is not None:
+            del frames
+            shm.close()
+            shm.unlink()
+        raise
+    finally:
+        cap.release()
+
+    if shm is None or frames is None:
+        return _EMPTY
+    chunk = _Chunk(shm.name, count, frames.shape[1:], frames.dtype.str)
+    del frames
+    # the consumer unlinks the shared memory block after reading it
+    shm.close()
+    return chunk
+
+
+def _seek(cap, videofile: str, hw_acceleration: bool, start: int):
+    """
+    Seek `cap` to frame `start`. OpenCV may land before or after the frame
+    (e.g. for a chunk that does not start at a keyframe); frames are grabbed forward from
+    where it lands, or from the first frame of the video if it lands after `start`.
+    """
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if position > start or position < 0:
+        cap.release()
+        cap = open_video(videofile, hw_acceleration)
+        position = 0
+    for _ in range(start - position):
+        if not cap.grab():
+            # the video ends before `start`
+            break
+    return cap
+
+
+def _read_chunk(chunk: "_Chunk"):
+    if chunk.shm is None:
+        return
+    shape = (chunk.num_frames, *chunk.shape)
+    path = os.path.join(SHM_DIR, chunk.shm)
+    if os.path.exists(path):
+        # frames are read-only views of the mapped block, which stays mapped after it is unlinked
+        # until no frame of the chunk is referenced
+        frames = np.memmap(path, dtype=chunk.dtype, mode="r", shape=shape)
+        _release(chunk)
+        yield from frames
+        return
+
+    # SharedMemory cannot outlive arrays backed by its buffer, so frames are copied out of it
+    shm = SharedMemory(chunk.shm)
+    frames = np.ndarray(shape, dtype=chunk.dtype, buffer=shm.buf)
+    try:
+        for idx in range(chunk.num_frames):
+            yield read_only(frames[idx].copy())
+    finally:
+        # the shared memory block cannot be closed while an array is backed by it
+        del frames
+        shm.close()
+        shm.unlink()
+
+
+def _release(chunk: "_Chunk"):
+    if chunk.shm is not None:
+        shm = SharedMemory(chunk.shm)
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,83 @@
+from dataclasses import asdict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .stream import Stream
+
+
+class Pipeline:
+    """
+    The DAG of Streams that `sink` depends on.
+    Each Stream registers its upstream Streams when it is constructed (see `Stream.__new__`),
+    so the DAG is built once and reused for every video.
+    """
+
+    sink: "Stream"
+    # All Streams of the pipeline, with every Stream after its upstream Streams
+    streams: "list[Stream]"
+    # Number of consumers of each Stream (indexed by id), including the consumer of `sink`
+    consumers: "dict[int, int]"
+
+    def __init__(self, sink: "Stream"):
+        self.sink = sink
+        self.streams = []
+        self.consumers = {id(sink): 1}
+
+        visited: "set[int]" = set()
+        # iterative post-order traversal, pipelines can be deeper than the recursion limit
+        stack: "list[tuple[Stream, bool]]" = [(sink, False)]
+        while len(stack) > 0:
+            stream, expanded = stack.pop()
+            if expanded:
+                self.streams.append(stream)
+                continue
+            if id(stream) in visited:
+                continue
+            visited.add(id(stream))
+
+            stack.append((stream, True))
+            for upstream in reversed(stream._upstreams):
+                self.consumers[id(upstream)] = self.consumers.get(id(upstream), 0) + 1
+                stack.append((upstream, False))
+
+    def __iter__(self):
+        return iter(self.streams)
+
+    def __len__(self):
+        return len(self.streams)
+
+    def upstreams(self, stream: "Stream") -> "list[Stream]":
+        return list(stream._upstreams)
+
+    def downstreams(self, stream: "Stream") -> "list[Stream]":
+        return [s for s in self.streams if any(u is stream for u in s._upstreams)]
+
+    def name(self, stream: "Stream") -> str:
+        """
+        Returns a name of `stream` that is unique in the pipeline.
+        """
+        index = next(i for i, s in enumerate(self.streams) if s is stream)
+        return f"{stream.__class__.__name__}_{index}"
+
+    def stats(self) -> "dict[str, dict]":
+        """
+        Returns the instrumentation of every Stream (see `StreamStats`) of the last streamed video,
+        keyed by the name of the Stream.
+        """
+        return {
+            self.name(s): {"stream": s.__class__.__name__, **asdict(s.stats)} for s in self.streams
+        }
+
+    def to_dot(self) -> str:
+        """
+        Returns the pipeline in the Graphviz DOT language, with edges from upstream to downstream.
+        """
+        names = {id(s): self.name(s) for s in self.streams}
+        lines = ["digraph Pipeline {"]
+        for stream in self.streams:
+            lines.append(f'  {names[id(stream)]} [label="{stream.__class__.__name__}"];')
+        for stream in self.streams:
+            for upstream in stream._upstreams:
+                lines.append(f"  {names[id(upstream)]} -> {names[id(stream)]};")
+        lines.append("}")
+        return "\n".join(lines)
@@ -1,4 +1,5 @@
 from collections.abc import Iterable
+from typing import TYPE_CHECKING
 
 from ...predicate import PredicateNode
 from ..payload import Payload
@@ -6,6 +7,9 @@ from ..stages.in_view.in_view import InView
 from ..video import Video
 from .stream import Stream
 
+if TYPE_CHECKING:
+    from ...database import Database
+
 
 class RoadVisibilityPruner(Stream[bool]):
     def __init__(
@@ -13,8 +17,9 @@ class RoadVisibilityPruner(Stream[bool]):
         distance: float,
         roadtypes: str | list[str] | None = None,
         predicate: PredicateNode | None = None,
+        database: "Database | None" = None,
     ):
-        self.inview = InView(distance, roadtypes, predicate)
+        self.inview = InView(distance, roadtypes, predicate, database)
 
     def _stream(self, video: Video) -> Iterable[bool]:
         keep, _ = self.inview.run(Payload(video))
@@ -1,45 +1,154 @@
+import queue
+import threading
+import time
 from abc import ABC, abstractmethod
-from collections.abc import Iterable, Iterator
-from typing import Generic, TypeVar
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from dataclasses import dataclass
+from typing import Generic, NamedTuple, TypeVar
 
+from ..utils.model_registry import load_model
+from ..utils.ring_buffer import RingBuffer
 from ..video import Video
-from .data_types import Skip
+from .data_types import Skip, skip
+from .pipeline import Pipeline
 
 T = TypeVar("T")
+U = TypeVar("U")
+M = TypeVar("M")
+
+# Maximum number of results a pipelined Stream produces ahead of its consumers
+QUEUE_SIZE = 8
+
+
+class _End:
+    pass
+
+
+class _Raised(NamedTuple):
+    error: BaseException
+
+
+@dataclass
+class StreamStats:
+    # time spent inside `_stream`, excluding the time spent in upstream Streams
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    # number of results that are not Skip, and that are Skip
+    produced: int = 0
+    skipped: int = 0
+    # time consumers waited for the results of a pipelined Stream
+    queue_wait: float = 0.0
+    # time the Stream waited for its consumers to free its buffer or queue
+    buffer_wait: float = 0.0
+    # maximum number of results, other than Skips, kept for lagging consumers
+    peak_buffered: int = 0
+    # time spent loading models that were not loaded yet in the process (see `load_model`)
+    load_time: float = 0.0
+
+
+# Per-thread stack of the running timers
+_timers = threading.local()
+
+
+class _Timer:
+    """
+    Measures the wall time and CPU time of a block,
+    excluding the time of the timers that run inside it in the same thread.
+    """
+
+    wall: float = 0.0
+    cpu: float = 0.0
+
+    def __enter__(self):
+        self._nested_wall = self._nested_cpu = 0.0
+        if not hasattr(_timers, "stack"):
+            _timers.stack = []
+        _timers.stack.append(self)
+        self._start = time.perf_counter(), time.thread_time()
+        return self
+
+    def __exit__(self, *_):
+        wall = time.perf_counter() - self._start[0]
+        cpu = time.thread_time() - self._start[1]
+        _timers.stack.pop()
+        if len(_timers.stack) > 0:
+            _timers.stack[-1]._nested_wall += wall
+            _timers.stack[-1]._nested_cpu += cpu
+        self.wall = wall - self._nested_wall
+        self.cpu = cpu - self._nested_cpu
 
 
 class Stream(Generic[T], ABC):
+    # Maximum number of results kept for consumers that lag behind; None for no limit.
+    # Skips do not count, so that pruned frames do not fill the buffer.
+    # When the buffer is full, the consumer ahead waits (pipelined) or fails (otherwise).
+    buffer_size: "int | None" = None
+
+    # Instrumentation of the last streamed video
+    stats: StreamStats
+
     _stream_count: int
     _stream_progress: list[int]
 
-    _front: int
-    _results: list[T | Skip | None]
+    _results: RingBuffer[T | Skip]
+    # number of results in `_results` that are not Skip
+    _buffered: int
     _video: Video | None
     _iter_stream: Iterator[T | Skip] | None
 
-    _visited: bool
     _ended: bool
+    # time spent loading models before the first video, reported in its stats
+    _load_time: float
+
+    _upstreams: "tuple[Stream, ...]"
+    _pipeline: "Pipeline | None"
+
+    _lock: threading.RLock
+    # The producer thread of a pipelined Stream updates its stats without holding `_lock`
+    _stats_lock: threading.Lock
+    # Notified when consumers release results, or append results other consumers wait for
+    _released: threading.Condition
+    _queue: "queue.Queue[T | Skip | _End | _Raised] | None"
+    _producer: threading.Thread | None
+    _exhausted: "_End | _Raised | None"
 
     def __new__(cls, *args, **kwargs):
         instance = super(Stream, cls).__new__(cls)
-        for arg in args + tuple(kwargs.values()):
-            if isinstance(arg, Stream):
-                arg._stream_progress.append(0)
+        # Streams given to the constructor are the upstream Streams of this Stream
+        instance._upstreams = tuple(
+            arg for arg in args + tuple(kwargs.values()) if isinstance(arg, Stream)
+        )
+        instance._pipeline = None
+        instance.stats = StreamStats()
+        instance._load_time = 0.0
+        instance._ended = False
         instance._stream_count = 0
         instance._stream_progress = []
-        instance._front = 0
-        instance._results = []
+        instance._results = RingBuffer()
+        instance._buffered = 0
         instance._video = None
         instance._iter_stream = None
+        instance._lock = threading.RLock()
+        instance._released = threading.Condition(instance._lock)
+        instance._stats_lock = threading.Lock()
+        instance._queue = None
+        instance._producer = None
+        instance._exhausted = None
         return instance
 
-    def iterate(self, video: Video) -> Iterable[T | Skip]:
-        self._initialize_stream(video)
-        self._initialize_stream_progress()
+    def iterate(self, video: Video, pipelined: bool = False) -> Iterable[T | Skip]:
+        """
+        Stream the results of `video`.
+        When `pipelined`, every Stream of the pipeline runs in its own thread and produces
+        up to `QUEUE_SIZE` results ahead of its consumers, so that stages overlap.
+        """
+        pipeline = self.pipeline
+        for stream in pipeline:
+            stream._initialize_stream(video, pipelined, pipeline.consumers[id(stream)])
         return self.stream(video)
 
-    def execute(self, video: Video) -> list[T | Skip]:
-        return list(self.iterate(video))
+    def execute(self, video: Video, pipelined: bool = False) -> list[T | Skip]:
+        return list(self.iterate(video, pipelined))
 
     def stream(self, video: Video) -> Iterable[T | Skip]:
         assert self._video == video, self._video
@@ -48,56 +157,125 @@ class Stream(Generic[T], ABC):
         idx = self._assign_stream_idx()
         try:
             while True:
-                while len(self._results) <= self._stream_progress[idx]:
-                    self._results.append(next(self._iter_stream))
+                with self._lock:
+                    while self._results.end <= self._stream_progress[idx]:
+                        self._wait_for_buffer(idx)
+                        if self._results.end <= self._stream_progress[idx]:
+                            self._append(self._next())
 
-                result = self._results[self._stream_progress[idx]]
-                assert result is not None
+                    result = self._results[self._stream_progress[idx]]
                 yield result
-                self._stream_progress[idx] += 1
-
-                self._free_memory()
+                with self._lock:
+                    self._stream_progress[idx] += 1
+                    self._free_memory()
         except StopIteration:
             return
 
+    def _wait_for_buffer(self, idx: int):
+        if self.buffer_size is None:
+            return
+        # another consumer may append the next result while this one waits
+        while (
+            self._buffered >= self.buffer_size and self._results.end <= self._stream_progress[idx]
+        ):
+            assert self._queue is not None, (
+                f"{self.__class__.__name__} buffers more than {self.buffer_size} results "
+                "for a lagging consumer; increase its buffer_size or run the pipeline pipelined"
+            )
+            # a lagging consumer in another thread releases results as it advances,
+            # and a consumer ahead appends them
+            with _Timer() as timer:
+                self._released.wait()
+            with self._stats_lock:
+                self.stats.buffer_wait += timer.wall
+
+    def _append(self, result: T | Skip):
+        self._results.append(result)
+        if self.buffer_size is not None:
+            self._released.notify_all()
+        if isinstance(result, Skip):
+            self.stats.skipped += 1
+        else:
+            self.stats.produced += 1
+            self._buffered += 1
+        self.stats.peak_buffered = max(self.stats.peak_buffered, self._buffered)
+
+    def _next(self) -> T | Skip:
+        assert self._iter_stream is not None
+        if self._queue is None:
+            return self._step(self._iter_stream)
+
+        if self._exhausted is None:
+            if self._producer is None:
+                self._producer = threading.Thread(target=self._produce, daemon=True)
+                self._producer.start()
+            with _Timer() as timer:
+                result = self._queue.get()
+            self.stats.queue_wait += timer.wall
+            if not isinstance(result, (_End, _Raised)):
+                return result
+            # other consumers reaching the end should not wait for the queue
+            self._exhausted = result
+
+        if isinstance(self._exhausted, _Raised):
+            raise self._exhausted.error
+        raise StopIteration
+
+    def _produce(self):
+        iter_stream, results = self._iter_stream, self._queue
+        assert iter_stream is not None
+        assert results is not None
+        try:
+            while True:
+                try:
+                    result = self._step(iter_stream)
+                except StopIteration:
+                    break
+                with _Timer() as timer:
+                    results.put(result)
+                with self._stats_lock:
+                    self.stats.buffer_wait += timer.wall
+            results.put(_End())
+        except BaseException as error:
+            results.put(_Raised(error))
+
+    def _step(self, iter_stream: Iterator[T | Skip]) -> T | Skip:
+        timer = _Timer()
+        try:
+            with timer:
+                return next(iter_stream)
+        finally:
+            self.stats.wall_time += timer.wall
+            self.stats.cpu_time += timer.cpu
+
+    @property
+    def pipeline(self) -> "Pipeline":
+        """
+        The DAG of this Stream and all the Streams it depends on.
+        """
+        if self._pipeline is None:
+            self._pipeline = Pipeline(self)
+        return self._pipeline
+
     def ended(self):
-        if not self._ended:
-            # raise Exception('not ended')
-            return False
-        for attr in dir(self):
-            stream = getattr(self, attr)
-            if isinstance(stream, Stream):
-                if not stream.ended():
-                    # raise Exception('not ended')
-                    return False
-        return True
+        return all(stream._ended for stream in self.pipeline)
 
     def end(self):
         self._ended = True
 
-    def _initialize_stream(self, video: Video):
-        self._stream_progress = []
+    def _initialize_stream(self, video: Video, pipelined: bool, consumers: int):
+        self._stream_progress = [0] * consumers
         self._stream_count = 0
         self._video = video
         self._iter_stream = iter(self._stream(video))
-        self._results = []
-        self._front = -1
-        self._visited = False
+        self._results = RingBuffer()
+        self._buffered = 0
+        self.stats = StreamStats(load_time=self._load_time)
+        self._load_time = 0.0
         self._ended = False
-        for attr in dir(self):
-            stream = getattr(self, attr)
-            if isinstance(stream, Stream):
-                stream._initialize_stream(video)
-
-    def _initialize_stream_progress(self):
-        self._stream_progress.append(0)
-        if self._visited:
-            return
-        self._visited = True
-        for attr in dir(self):
-            stream = getattr(self, attr)
-            if isinstance(stream, Stream):
-                stream._initialize_stream_progress()
+        self._queue = queue.Queue(QUEUE_SIZE) if pipelined else None
+        self._producer = None
+        self._exhausted = None
 
     def _assign_stream_idx(self):
         idx = self._stream_count
@@ -108,12 +286,66 @@ class Stream(Generic[T], ABC):
         )
         return idx
 
+    def _batched(
+        self,
+        inputs: Iterable[U | Skip],
+        batch_size: int,
+        process: Callable[[list[U]], Iterable[T]],
+    ) -> Iterator[T | Skip]:
+        """
+        Run `process` on batches of up to `batch_size` non-Skip inputs,
+        and yield one result per input, in order. Skips are passed through.
+        """
+        batch: list[U] = []
+        # number of Skips that come after each input of the batch
+        skips: list[int] = []
+        for item in inputs:
+            if isinstance(item, Skip):
+                if len(batch) == 0:
+                    yield skip
+                else:
+                    skips[-1] += 1
+                continue
+
+            batch.append(item)
+            skips.append(0)
+            if len(batch) == batch_size:
+                yield from _unbatch(process(batch), skips)
+                batch, skips = [], []
+        if len(batch) > 0:
+            yield from _unbatch(process(batch), skips)
+
+    def _load_model(self, key: Hashable, load: Callable[[], M], reload: bool = False) -> M:
+        """
+        Returns the model of `key`, loaded with `load` once per process (see `load_model`).
+        """
+        model, load_time = load_model(key, load, reload)
+        with self._stats_lock:
+            if self._video is None:
+                # loaded in the constructor, before the first video
+                self._load_time += load_time
+            else:
+                self.stats.load_time += load_time
+        return model
+
     def _free_memory(self):
-        _min_progress = min(self._stream_progress)
-        while self._front < _min_progress:
-            if self._front >= 0:
-                self._results[self._front] = None
-            self._front += 1
+        start = self._results.start
+        end = min(min(self._stream_progress), self._results.end)
+        for index in range(start, end):
+            if not isinstance(self._results[index], Skip):
+                self._buffered -= 1
+        self._results.release(end)
+        if self._results.start > start:
+            self._released.notify_all()
 
     @abstractmethod
     def _stream(self, video: Video) -> Iterable[T | Skip]: ...
+
+
+def _unbatch(results: Iterable[T], skips: list[int]) -> Iterator[T | Skip]:
+    results = list(results)
+    assert len(results) == len(skips), (len(results), len(skips))
+    for result, _skips in zip(results, skips):
+        yield result
+        for _ in range(_skips):
+            yield skip
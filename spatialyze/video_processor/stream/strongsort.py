@@ -1,5 +1,8 @@
+import copy
 import datetime
 import os
+from collections import deque
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 from typing import NamedTuple
 
@@ -11,6 +14,7 @@ from ..camera_config import CameraConfig
 from ..modules.yolo_tracker.trackers.multi_tracker_zoo import StrongSORT as _StrongSORT
 from ..modules.yolo_tracker.trackers.multi_tracker_zoo import create_tracker
 from ..modules.yolo_tracker.trackers.strong_sort.sort.track import Track
+from ..modules.yolo_tracker.yolov5.utils.general import xyxy2xywh
 from ..modules.yolo_tracker.yolov5.utils.torch_utils import select_device
 from ..types import DetectionId
 from ..video import Video
@@ -38,23 +42,29 @@ class TrackingResult(NamedTuple):
 
 class StrongSORT(Stream[list[TrackingResult]]):
     def __init__(
-        self, detections: Stream[Detection2D] | Stream[Detection3D], frames: Stream[npt.NDArray]
+        self,
+        detections: Stream[Detection2D] | Stream[Detection3D],
+        frames: Stream[npt.NDArray],
+        batch_size: int = 1,
     ):
         self.detection2ds = detections
         self.frames = frames
+        self.batch_size = batch_size
 
     def _stream(self, video: Video):
         device = select_device()
-        strongsort = create_tracker("strongsort", REID_WEIGHTS, device, False)
-        assert isinstance(strongsort, _StrongSORT)
+        key = ("strongsort", str(REID_WEIGHTS), str(device))
+        initial = self._load_model(key, lambda: _load_tracker(device))
+        # the tracker keeps the tracks of a video, so each video gets its own copy;
+        # copies share the ReID model, which is only read
+        strongsort = copy.deepcopy(initial, {id(initial.model): initial.model})
+        if self.batch_size > 1:
+            strongsort.model = _ReIDFeatures(strongsort.model)
         assert hasattr(strongsort, "tracker")
         assert hasattr(strongsort.tracker, "camera_update")
-        assert hasattr(strongsort, "model")
-        assert hasattr(strongsort.model, "warmup")
         curr_frame, prev_frame = None, None
         deleted_tracks_idx = 0
         with torch.no_grad():
-            strongsort.model.warmup()
             # init_end = time.time()
 
             # update_time = 0
@@ -64,14 +74,14 @@ class StrongSORT(Stream[list[TrackingResult]]):
             saved_detections: list[dict[int, torch.Tensor]] = []
             clss: list[str] | None = None
             empty_img = None
-            for detection, im0s in zip(
-                self.detection2ds.stream(video),
-                self.frames.stream(video),
-                strict=True,
+            for detection, im0s in self._extract_features(
+                strongsort,
+                zip(self.detection2ds.stream(video), self.frames.stream(video), strict=True),
             ):
                 if not isinstance(detection, Skip):
                     assert not isinstance(im0s, Skip), type(im0s)
-                    im0 = im0s.copy()
+                    # the tracker only reads the frame
+                    im0 = im0s
                 else:
                     if empty_img is None:
                         empty_img = np.zeros(
@@ -121,6 +131,91 @@ class StrongSORT(Stream[list[TrackingResult]]):
         # })
         self.end()
 
+    def _extract_features(
+        self,
+        strongsort: "_StrongSORT",
+        frames: "Iterable[tuple[Detection2D | Detection3D | Skip, npt.NDArray | Skip]]",
+    ) -> "Iterator[tuple[Detection2D | Detection3D | Skip, npt.NDArray | Skip]]":
+        """
+        With a `batch_size` larger than 1, compute the ReID features of the detections
+        of `batch_size` frames at a time, and feed them to `strongsort.update`
+        instead of computing them for each frame.
+        """
+        if self.batch_size == 1:
+            yield from frames
+            return
+
+        batch: "list[tuple[Detection2D | Detection3D | Skip, npt.NDArray | Skip]]" = []
+        for frame in frames:
+            batch.append(frame)
+            if len(batch) == self.batch_size:
+                yield from _with_features(strongsort, batch)
+                batch = []
+        if len(batch) > 0:
+            yield from _with_features(strongsort, batch)
+
+
+class _ReIDFeatures:
+    """
+    The ReID model of a StrongSORT tracker, extended to compute the features of the detections
+    of a batch of frames in one inference (see `_with_features`).
+    While `crops` is a list, the crops that the tracker passes to the model are recorded instead;
+    afterwards, the tracker gets the precomputed `features` in the order that it requests them.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.crops: "list[list[npt.NDArray]] | None" = None
+        self.features: "deque[torch.Tensor]" = deque()
+
+    def __call__(self, crops: "list[npt.NDArray]"):
+        if self.crops is not None:
+            self.crops.append(crops)
+            return np.array([])
+        if len(self.features) > 0:
+            return self.features.popleft()
+        return self.model(crops)
+
+    def __getattr__(self, name: str):
+        return getattr(self.model, name)
+
+
+def _with_features(
+    strongsort: "_StrongSORT",
+    batch: "list[tuple[Detection2D | Detection3D | Skip, npt.NDArray | Skip]]",
+) -> "Iterator[tuple[Detection2D | Detection3D | Skip, npt.NDArray | Skip]]":
+    reid = strongsort.model
+    assert isinstance(reid, _ReIDFeatures), type(reid)
+    assert len(reid.features) == 0, len(reid.features)
+
+    # the tracker crops the detections of every frame, as it does in `strongsort.update`
+    reid.crops = []
+    try:
+        for detection, im0 in batch:
+            if isinstance(detection, Skip) or len(detection[0]) == 0:
+                continue
+            assert not isinstance(im0, Skip), type(im0)
+            strongsort.height, strongsort.width = im0.shape[:2]
+            strongsort._get_features(xyxy2xywh(detection[0][:, 0:4].cpu().numpy()), im0)
+        crops = reid.crops
+    finally:
+        reid.crops = None
+
+    if len(crops) > 0:
+        features = reid.model([crop for _crops in crops for crop in _crops])
+        reid.features.extend(torch.split(features, [len(_crops) for _crops in crops]))
+    yield from batch
+
+
+def _load_tracker(device: torch.device) -> "_StrongSORT":
+    strongsort = create_tracker("strongsort", REID_WEIGHTS, device, False)
+    assert isinstance(strongsort, _StrongSORT)
+    assert hasattr(strongsort, "model")
+    assert hasattr(strongsort.model, "warmup")
+    with torch.no_grad():
+        strongsort.model.warmup()
+    return strongsort
+
 
 def _process_track(
     track: Track,
@@ -1,9 +1,12 @@
+import hashlib
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import numpy as np
 import numpy.typing as npt
 import torch
 
+from ...utils.file_hash import file_hash
 from ..modules.yolo_tracker.yolov5.models.common import DetectMultiBackend
 from ..modules.yolo_tracker.yolov5.utils.augmentations import letterbox
 from ..modules.yolo_tracker.yolov5.utils.general import (
@@ -14,10 +17,15 @@ from ..modules.yolo_tracker.yolov5.utils.general import (
 from ..modules.yolo_tracker.yolov5.utils.torch_utils import select_device
 from ..stages.detection_2d.yolo_detection import class_mapping_to_list
 from ..types import DetectionId
+from ..utils.detection_cache import CONF_THRES, DetectionCache
+from ..utils.disk_cache import DiskCache
 from ..video import Video
 from .data_types import Detection2D, Skip, skip
 from .stream import Stream
 
+if TYPE_CHECKING:
+    from ..utils.road_region import RoadRegion
+
 FILE = Path(__file__).resolve()
 SPATIALYZE = FILE.parent.parent.parent.parent.parent
 WEIGHTS = SPATIALYZE / "weights"
@@ -28,6 +36,19 @@ MODEL = "yolov5s"
 
 
 class Yolo(Stream[Detection2D]):
+    """
+    Detect objects in frames with YOLOv5.
+    By default, the PyTorch model is loaded through torch.hub and runs eagerly.
+    With `weights`, an exported model (.onnx for ONNX Runtime, or .torchscript) is loaded
+    from the file without torch.hub; TorchScript models are frozen and optimized for inference.
+    Exported models take padded 640x640 frames, and ONNX models only take batches of 1 frame
+    unless they are exported with dynamic axes.
+    `threads` sets the number of threads of intra-op parallelism of an ONNX Runtime session;
+    the number of threads of torch is process-wide, and set with `World(threads=...)`.
+    With `roi`, objects are only detected in the region of each video's frames
+    where the road appears (see `RoadRegion`), and their boxes are mapped back to the frames.
+    """
+
     def __init__(
         self,
         frames: Stream[npt.NDArray],
@@ -35,16 +56,37 @@ class Yolo(Stream[Detection2D]):
         conf_thres: float = 0.25,
         iou_thres: float = 0.45,
         max_det: int = 1000,
-        classes=None,  # filter by class: --class 0, or --class 0 2 3
+        classes: "list[int | str] | None" = None,  # filter by class index or name
         agnostic_nms=False,  # class-agnostic NMS
         augment=False,  # augmented inference
         force_reload=False,  # download model even if it exists
+        batch_size: int = 1,  # number of frames per inference
+        cache: "DiskCache | None" = None,  # cache of padded frames and detections
+        weights: "str | None" = None,  # exported model, instead of the model from torch.hub
+        threads: "int | None" = None,  # number of threads of an ONNX Runtime session
+        roi: "RoadRegion | None" = None,  # region of the frames to detect objects in
     ):
         self.device = select_device("")
-        model = torch.hub.load(
-            REPO, MODEL, verbose=False, _verbose=False, force_reload=force_reload
-        )
-        self.model: "DetectMultiBackend" = model.model.to(self.device)
+        self.model: "DetectMultiBackend"
+        if weights is None:
+            # identifies the weights of the model in cached detections
+            self.model_id = f"{REPO}/{MODEL}"
+            key = ("yolo", self.model_id, str(self.device))
+            self.model = self._load_model(
+                key, lambda: load_hub(self.device, force_reload), force_reload
+            )
+        else:
+            self.model_id = f"{Path(weights).name}-{file_hash(weights).hex()}"
+            key = ("yolo", self.model_id, str(self.device), half, threads)
+            self.model = self._load_model(
+                key, lambda: warmup(load_exported(weights, self.device, half, threads))
+            )
+            fixed = fixed_batch_size(self.model)
+            if batch_size > 1 and fixed is not None:
+                raise ValueError(
+                    f"{weights} takes batches of {fixed} frames; "
+                    f"export it with dynamic axes to run batches of {batch_size} frames"
+                )
 
         stride, pt = self.model.stride, self.model.pt
         assert isinstance(stride, int), type(stride)
@@ -56,8 +98,15 @@ class Yolo(Stream[Detection2D]):
         self.iou_thres = iou_thres
         self.max_det = max_det
         self.classes = classes
+        # indices of `classes` in the classes of the model, resolved from the class names
+        self._class_indices: "list[int] | None" = None
         self.agnostic_nms = agnostic_nms
         self.augment = augment
+        self.batch_size = batch_size
+        self.cache = cache
+        self.roi = roi
+        # padded frames of a batch, reused across batches
+        self._inputs: "npt.NDArray | None" = None
 
         self.frames = frames
 
@@ -67,47 +116,239 @@ class Yolo(Stream[Detection2D]):
 
             assert isinstance(_names, dict), type(_names)
             names: list[str] = class_mapping_to_list(_names)
-            self.model.eval()
-
-            assert isinstance(self.imgsz, list), type(self.imgsz)
-            self.model.warmup(imgsz=(1, 3, *self.imgsz))  # warmup
-
-            for frame_idx, im0 in enumerate(self.frames.stream(video)):
-                if isinstance(im0, Skip):
-                    yield skip
-                    continue
-
-                im, _, _ = letterbox(im0, self.imgsz, stride=32, auto=True)  # padded resize
-                im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
-                im = np.ascontiguousarray(im)  # contiguous
-
-                # t1 = time_sync()
-                im = torch.from_numpy(im).to(self.device)
-                im = im.half() if self.half else im.float()
-                im /= 255.0  # 0 - 255 to 0.0 - 1.0
-                if len(im.shape) == 3:
-                    im = im[None]  # expand for batch dim
-
-                # Inference
-                pred = self.model(im, augment=self.augment)
-
-                # Apply NMS
-                pred = non_max_suppression(
-                    pred,
-                    self.conf_thres,
-                    self.iou_thres,
-                    self.classes,
-                    self.agnostic_nms,
-                    max_det=self.max_det,
-                )
+            self._class_indices = class_indices(self.classes, names)
 
-                # Process detections
-                assert isinstance(pred, list), type(pred)
-                assert len(pred) == 1, len(pred)
-                det = pred[0]
-                assert isinstance(det, torch.Tensor), type(det)
-                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
-                yield Detection2D(
-                    det, names, [DetectionId(frame_idx, order) for order in range(len(det))]
-                )
+            region = None if self.roi is None else self.roi(video)
+            frames = (
+                skip if isinstance(im0, Skip) else (frame_idx, crop(im0, region))
+                for frame_idx, im0 in enumerate(self.frames.stream(video))
+            )
+            namespace = None if self.cache is None else self._namespace(video, region)
+            cache = self._detection_cache(video, len(names), region)
+            yield from self._batched(
+                frames,
+                self.batch_size,
+                lambda b: self._detect(b, names, namespace, cache, region),
+            )
+            if cache is not None:
+                cache.save()
         self.end()
+
+    def _detect(
+        self,
+        batch: "list[tuple[int, npt.NDArray]]",
+        names: "list[str]",
+        namespace: "str | None" = None,
+        cache: "DetectionCache | None" = None,
+        region: "tuple[int, int, int, int] | None" = None,
+    ) -> "list[Detection2D]":
+        if cache is None:
+            pred, shape = self._infer(batch, namespace)
+            preds = self._nms(pred)
+        else:
+            # only run the model on frames without cached candidates,
+            # and rerun non-maximum suppression on the candidates of every frame
+            misses = [(frame_idx, im0) for frame_idx, im0 in batch if frame_idx not in cache]
+            if len(misses) > 0:
+                pred, shape = self._infer(misses, namespace)
+                for (frame_idx, _), p in zip(misses, pred):
+                    cache.add(frame_idx, p, shape)
+            assert cache.shape is not None
+            shape = cache.shape
+            preds = [self._nms(cache.prediction(idx, self.device))[0] for idx, _ in batch]
+
+        # Process detections
+        assert len(preds) == len(batch), (len(preds), len(batch))
+        detections: "list[Detection2D]" = []
+        for det, (frame_idx, im0) in zip(preds, batch):
+            assert isinstance(det, torch.Tensor), type(det)
+            det[:, :4] = scale_boxes(shape, det[:, :4], im0.shape).round()
+            if region is not None:
+                # from the cropped frame to the frame
+                left, top, _, _ = region
+                det[:, :4] += torch.tensor([left, top, left, top], device=det.device)
+            # a detection is numbered by its candidate, so it has the same id
+            # whichever classes are kept
+            orders = det[:, 6].round().long()
+            det = det[:, :6]
+            dids = [DetectionId(frame_idx, order) for order in orders.tolist()]
+            detections.append(Detection2D(det, names, dids))
+        return detections
+
+    def _infer(
+        self,
+        batch: "list[tuple[int, npt.NDArray]]",
+        namespace: "str | None",
+    ) -> "tuple[torch.Tensor, tuple[int, int]]":
+        """
+        Returns the output of the model on the padded frames of `batch`, and their shape.
+        """
+        inputs: "npt.NDArray | None" = None
+        for idx, (frame_idx, im0) in enumerate(batch):
+            im = self._letterbox(im0, frame_idx, namespace)
+            if inputs is None:
+                # frames of the same video have the same size, and so do their padded images
+                inputs = self._input_buffer(im.shape)[: len(batch)]
+            inputs[idx] = im
+        assert inputs is not None
+
+        # t1 = time_sync()
+        im = torch.from_numpy(inputs).to(self.device)
+        # BHWC to BCHW, BGR to RGB, on the device instead of copying the frames on the CPU
+        im = im.permute(0, 3, 1, 2).flip(1).contiguous()
+        im = im.half() if self.half else im.float()
+        im /= 255.0  # 0 - 255 to 0.0 - 1.0
+
+        # Inference
+        pred = self.model(im, augment=self.augment)
+        if isinstance(pred, (list, tuple)):
+            # inference output only
+            pred = pred[0]
+        assert isinstance(pred, torch.Tensor), type(pred)
+        height, width = im.shape[2:]
+        return pred, (height, width)
+
+    def _nms(self, pred: "torch.Tensor") -> "list[torch.Tensor]":
+        """
+        Returns the detections of each frame in `pred` as rows of (x1, y1, x2, y2, confidence,
+        class, candidate), where candidate is the index of the detection among the candidates
+        of its frame with an objectness above `conf_thres`.
+        The candidates are the same in cached predictions, so are the indices.
+        """
+        pred = pred.float()
+        candidates = pred[..., 4] > self.conf_thres
+        # non-maximum suppression multiplies the columns after the box by the objectness
+        indices = (candidates.cumsum(-1) - 1) / pred[..., 4]
+        pred = non_max_suppression(
+            torch.cat((pred, indices[..., None]), -1),
+            self.conf_thres,
+            self.iou_thres,
+            self._class_indices,
+            self.agnostic_nms,
+            max_det=self.max_det,
+            nm=1,
+        )
+        assert isinstance(pred, list), type(pred)
+        return pred
+
+    def _letterbox(self, im0: "npt.NDArray", frame_idx: int, namespace: "str | None"):
+        if self.cache is not None and namespace is not None:
+            im = self.cache.get(namespace, frame_idx)
+            if im is not None:
+                return im
+
+        # exported models take frames padded to the full size
+        im, _, _ = letterbox(im0, self.imgsz, stride=32, auto=self.pt)  # padded resize
+        if self.cache is not None and namespace is not None:
+            self.cache.put(namespace, frame_idx, im)
+        return im
+
+    def _namespace(self, video: "Video", region: "tuple[int, int, int, int] | None" = None) -> str:
+        """
+        Returns the DiskCache namespace of the padded frames of `video`,
+        which depend on the content of the video, the cropped region and the padding parameters.
+        """
+        assert isinstance(self.imgsz, list), type(self.imgsz)
+        height, width = self.imgsz
+        digest = file_hash(video.videofile).hex()
+        if region is not None:
+            digest += "-" + "-".join(map(str, region))
+        padding = "32" if self.pt else "full"
+        return f"letterbox-{digest}-{height}x{width}-{padding}"
+
+    def _detection_cache(
+        self,
+        video: "Video",
+        num_classes: int,
+        region: "tuple[int, int, int, int] | None" = None,
+    ) -> "DetectionCache | None":
+        # cached candidates cannot serve a lower confidence threshold
+        if self.cache is None or self.conf_thres < CONF_THRES:
+            return None
+
+        # non-maximum suppression parameters are applied to the cached candidates
+        assert isinstance(self.imgsz, list), type(self.imgsz)
+        key = hashlib.sha256(file_hash(video.videofile))
+        key.update(f"{self.model_id}-{self.imgsz}-{self.augment}-{self.half}".encode())
+        if region is not None:
+            key.update(f"-{region}".encode())
+        return DetectionCache(self.cache, f"detections-{key.hexdigest()}", num_classes)
+
+    def _input_buffer(self, shape: "tuple[int, ...]") -> "npt.NDArray":
+        if self._inputs is None or self._inputs.shape[1:] != shape:
+            self._inputs = np.empty((self.batch_size, *shape), dtype=np.uint8)
+        return self._inputs
+
+
+def crop(im0: "npt.NDArray", region: "tuple[int, int, int, int] | None") -> "npt.NDArray":
+    if region is None:
+        return im0
+    left, top, right, bottom = region
+    return im0[top:bottom, left:right]
+
+
+def class_indices(classes: "list[int | str] | None", names: "list[str]") -> "list[int] | None":
+    """
+    Returns the indices of `classes` in `names`, where each class is either an index or a name.
+    """
+    if classes is None:
+        return None
+    indices: "list[int]" = []
+    for c in classes:
+        if isinstance(c, str):
+            assert c in names, f"{c} is not a class of the model"
+            c = names.index(c)
+        indices.append(c)
+    return indices
+
+
+def load_hub(device: torch.device, force_reload: bool = False) -> "DetectMultiBackend":
+    model = torch.hub.load(REPO, MODEL, verbose=False, _verbose=False, force_reload=force_reload)
+    return warmup(model.model.to(device))
+
+
+def warmup(model: "DetectMultiBackend") -> "DetectMultiBackend":
+    model.eval()
+    imgsz = check_img_size((640, 640), s=int(model.stride))
+    assert isinstance(imgsz, list), type(imgsz)
+    with torch.no_grad():
+        model.warmup(imgsz=(1, 3, *imgsz))
+    return model
+
+
+def fixed_batch_size(model: "DetectMultiBackend") -> "int | None":
+    """
+    Returns the batch size of an ONNX model exported without dynamic axes,
+    or None if the model takes batches of any size.
+    """
+    if not model.onnx:
+        return None
+    batch = model.session.get_inputs()[0].shape[0]
+    return batch if isinstance(batch, int) else None
+
+
+def load_exported(
+    weights: str,
+    device: torch.device,
+    half: bool = False,
+    threads: "int | None" = None,
+) -> "DetectMultiBackend":
+    """
+    Load a YOLOv5 model exported to ONNX or TorchScript,
+    with its stride and class names from the metadata of the exported file.
+    """
+    model = DetectMultiBackend(weights, device=device, fp16=half)
+    assert model.onnx or model.jit, f"{weights} is not an ONNX or TorchScript model"
+
+    if model.jit:
+        # fold the weights into the graph as constants, and fuse operators
+        model.model = torch.jit.optimize_for_inference(torch.jit.freeze(model.model.eval()))
+    elif threads is not None:
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        model.session = onnxruntime.InferenceSession(
+            weights, options, providers=model.session.get_providers()
+        )
+    return model
@@ -0,0 +1,86 @@
+import numpy as np
+import numpy.typing as npt
+import torch
+
+from .disk_cache import DiskCache
+
+# Candidates with a lower objectness are not cached.
+# Cached candidates can only serve detections with a confidence threshold at least this.
+CONF_THRES = 0.1
+
+
+class DetectionCache:
+    """
+    Candidate detections of the frames of a video before non-maximum suppression,
+    stored in a DiskCache as one array of the candidates of all frames, the offsets of
+    the candidates of each frame in it, and which frames are detected.
+    Each candidate is (x, y, w, h, objectness, confidence, class) of its most confident class,
+    which is all that non-maximum suppression uses, so it can be rerun with other thresholds.
+    """
+
+    def __init__(self, cache: DiskCache, namespace: str, num_classes: int):
+        self.cache = cache
+        self.namespace = namespace
+        self.num_classes = num_classes
+        # shape of the padded frames the candidates are detected in
+        self.shape: "tuple[int, int] | None" = None
+        self._candidates: "dict[int, npt.NDArray]" = {}
+        self._modified = False
+
+        keys = ["candidates", "offsets", "detected", "shape"]
+        arrays = [cache.get(namespace, key) for key in keys]
+        if any(array is None for array in arrays):
+            return
+        candidates, offsets, detected, shape = arrays
+        assert candidates is not None and offsets is not None
+        assert detected is not None and shape is not None
+        if len(offsets) != len(detected) + 1 or offsets[-1] != len(candidates):
+            # arrays of different versions, written concurrently
+            return
+        self.shape = int(shape[0]), int(shape[1])
+        for idx in np.flatnonzero(detected):
+            self._candidates[int(idx)] = candidates[offsets[idx] : offsets[idx + 1]]
+
+    def __contains__(self, frame_idx: int) -> bool:
+        return frame_idx in self._candidates
+
+    def add(self, frame_idx: int, prediction: torch.Tensor, shape: "tuple[int, int]"):
+        """
+        Add the output of the model on a padded frame of `shape`,
+        with a row of (x, y, w, h, objectness, class confidences...) for each candidate.
+        """
+        assert self.shape is None or self.shape == shape, (self.shape, shape)
+        self.shape = shape
+        x = prediction[prediction[:, 4] > CONF_THRES]
+        conf, cls = x[:, 5:].max(1, keepdim=True)
+        candidates = torch.cat((x[:, :5], conf, cls.float()), 1)
+        self._candidates[frame_idx] = candidates.float().cpu().numpy()
+        self._modified = True
+
+    def prediction(self, frame_idx: int, device: torch.device) -> torch.Tensor:
+        """
+        Returns the candidates of a frame in the output format of the model.
+        """
+        candidates = torch.from_numpy(np.array(self._candidates[frame_idx]))
+        prediction = torch.zeros((len(candidates), 5 + self.num_classes))
+        prediction[:, :5] = candidates[:, :5]
+        prediction[torch.arange(len(candidates)), 5 + candidates[:, 6].long()] = candidates[:, 5]
+        return prediction[None].to(device)
+
+    def save(self):
+        if not self._modified or self.shape is None:
+            return
+
+        length = max(self._candidates) + 1
+        detected = np.zeros(length, dtype=bool)
+        detected[list(self._candidates)] = True
+        # frames that are not detected have no candidates
+        counts = [len(self._candidates.get(idx, ())) for idx in range(length)]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        candidates = np.concatenate([c for _, c in sorted(self._candidates.items())])
+
+        self.cache.put(self.namespace, "shape", np.array(self.shape))
+        self.cache.put(self.namespace, "detected", detected)
+        self.cache.put(self.namespace, "offsets", offsets)
+        self.cache.put(self.namespace, "candidates", candidates.reshape(-1, 7))
+        self._modified = False
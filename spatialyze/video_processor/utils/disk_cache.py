@@ -0,0 +1,100 @@
+import os
+import threading
+
+import numpy as np
+import numpy.typing as npt
+
+# Default size budget of a DiskCache
+MAX_BYTES = 16 * (1 << 30)
+# Fraction of the size budget that eviction reduces the cache to
+LOW_WATERMARK = 0.9
+
+
+class DiskCache:
+    """
+    Arrays stored as .npy files under `directory`, grouped by namespace,
+    and read back memory-mapped (read-only).
+    When the cache grows over `max_bytes`, the least recently used arrays are evicted.
+    Multiple processes can share a cache directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES):
+        assert max_bytes > 0, max_bytes
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # estimated size of the cache in bytes, computed on the first write
+        self._size: "int | None" = None
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: "str | int") -> "npt.NDArray | None":
+        path = self._path(namespace, key)
+        try:
+            array = np.load(path, mmap_mode="r")
+            # the modification time of a file is the last time it was used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return array
+
+    def put(self, namespace: str, key: "str | int", array: npt.NDArray):
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file so that readers never see a partial array
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                _remove(path)
+            self._size = 0
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        size = sum(size for _, _, size in entries)
+        for path, _, _size in entries:
+            if size <= self.max_bytes * LOW_WATERMARK:
+                break
+            _remove(path)
+            size -= _size
+        self._size = size
+
+    def _entries(self) -> "list[tuple[str, int, int]]":
+        """
+        Returns the path, last used time and size of every array in the cache.
+        """
+        entries: "list[tuple[str, int, int]]" = []
+        for namespace in os.scandir(self.directory):
+            if not namespace.is_dir():
+                continue
+            for entry in os.scandir(namespace.path):
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # evicted by another process
+                    continue
+                entries.append((entry.path, stat.st_mtime_ns, stat.st_size))
+        return entries
+
+    def _path(self, namespace: str, key: "str | int") -> str:
+        return os.path.join(self.directory, namespace, f"{key}.npy")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,7 +1,6 @@
 import datetime
 
 from postgis import Point
-from psycopg2.sql import SQL, Composed, Literal
 
 from ...database import Database
 from ...video_processor.stream.data_types import Detection3D
@@ -16,23 +15,21 @@ def insert_detections(
 ):
     dets, clss, dids = detections
     assert len(dets) > 0, dets
-    rows: list[Composed] = []
+    rows: list[tuple] = []
     for did, det in zip(dids, dets):
         fid, oid = did
         det = det.detach().cpu().numpy()
         cls = int(det[5])
         x, y, z = map(float, (det[6:9] + det[9:12]) / 2.0)
-        obj = (
-            f"{fid}__{oid}",
-            camera_id,
-            clss[cls],
-            frame_num,
-            Point(x, y, z),
-            timestamp,
+        rows.append(
+            (
+                f"{fid}__{oid}",
+                camera_id,
+                clss[cls],
+                frame_num,
+                Point(x, y, z),
+                timestamp,
+            )
         )
-        row = SQL("({})").format(SQL(",").join(map(Literal, obj)))
-        rows.append(row)
 
-    insert = SQL("INSERT INTO Item_Detection VALUES ")
-    database.execute(insert + SQL(",").join(rows))
-    database._commit()
+    database.insert_detections(rows)
@@ -1,12 +1,10 @@
+import math
 from typing import TYPE_CHECKING, TypeVar
 
 import numpy as np
-import numpy.typing as npt
 from postgis import Point
-from psycopg2.sql import SQL, Literal
 
 from ..types import Float3
-from .infer_heading import infer_heading
 
 if TYPE_CHECKING:
     from ...database import Database
@@ -20,6 +18,14 @@ def insert_trajectory(
     database: "Database",
     trajectory: "Trajectory",
 ):
+    database.insert_trajectory(interpolate_trajectory(trajectory))
+
+
+def interpolate_trajectory(trajectory: "Trajectory") -> "list[PointTuple[Point]]":
+    """
+    Returns one row per frame from the first to the last frame of the trajectory,
+    with translations and headings of frames without detections linearly interpolated.
+    """
     (
         item_id,
         ids,
@@ -29,67 +35,43 @@ def insert_trajectory(
         headings,
     ) = trajectory
 
-    prevPoint: Float3 | None = None
+    frames = np.array(ids)
+    assert np.all(frames[1:] > frames[:-1]), ids
     st, en = ids[0], ids[-1]
-    tuples: list[PointTuple[Float3] | None] = [None for _ in range(st, en + 1)]
-
-    P = TypeVar("P", Float3, Point)
-
-    def point(idx: int, p: P, h: float | None):
-        return (item_id, camera_id, object_type, idx, p, h)
-
-    for i, p, h in zip(ids, points, headings):
-        h = infer_heading(h, prevPoint, p)
-        tuples[i - st] = point(i, p, h)
-        prevPoint = p
-
-    prevHeading: float | None = None
-    prevPoint = None
-    tuplesWithPoints: list[PointTuple[Point]] = []
-    for idx in range(st, en + 1):
-        i = idx - st
-        t = tuples[i]
-        if t is None:
-            assert prevPoint is not None
-            npPrevPoint = np.array(prevPoint)
-            npCurrPoint: None | npt.NDArray = None
-            for jdx in range(idx, en + 1):
-                j = jdx - st
-                nt = tuples[j]
-                if nt is None:
-                    continue
-                cp = nt[4]
-                assert cp is not None
-                npnp = np.array(cp)
-                npCurrPoint = npPrevPoint + ((npnp - npPrevPoint) * (i - (i - 1)) / (j - (i - 1)))
-                break
-            assert isinstance(npCurrPoint, np.ndarray)
-            x, y, z = np.array(npCurrPoint)
-            t = point(idx, (float(x), float(y), float(z)), None)
-            prevPoint = float(x), float(y), float(z)
-        else:
-            prevPoint = t[4]
-        tuplesWithPoints.append(point(idx, Point(prevPoint), t[5]))
+    allFrames = np.arange(st, en + 1)
 
-    tuplesWithPointsHeadings: list[PointTuple[Point]] = []
-    for i, t in enumerate(tuplesWithPoints):
-        h = t[5]
-        if h is None and prevHeading is not None:
-            for j, nt in enumerate(tuplesWithPoints):
-                nh = nt[5]
-                if j <= i:
-                    continue
-                if nh is not None:
-                    h = prevHeading + ((nh - prevHeading) * (i - (i - 1)) / (j - (i - 1)))
-                    break
-        tuplesWithPointsHeadings.append((*t[:5], h))
-        prevHeading = h
+    # Translations: linear interpolation between detected frames
+    npPoints = np.array(points, dtype=np.float64)
+    npAllPoints = np.stack([np.interp(allFrames, frames, npPoints[:, k]) for k in range(3)], axis=1)
 
-    obj = SQL(",").join(map(value, tuplesWithPointsHeadings))
-    insert = SQL("INSERT INTO Item_Trajectory VALUES {}")
-    database.execute(insert.format(obj))
-    database._commit()
+    # Headings of detected frames: the given heading (in degrees), otherwise inferred from
+    # the direction from the previously detected point (0 is north (y-axis) and counter clockwise)
+    npHeadings = np.array([np.nan if h is None else h for h in headings], dtype=np.float64)
+    npHeadings = np.degrees(npHeadings)
+    dx, dy = np.diff(npPoints[:, 0]), np.diff(npPoints[:, 1])
+    inferred = np.degrees(np.arctan2(dy, dx)) - 90
+    npHeadings[1:] = np.where(np.isnan(npHeadings[1:]), inferred, npHeadings[1:])
 
+    # Headings of the other frames: linear interpolation between frames with headings.
+    # Frames before the first or after the last frame with a heading have no heading.
+    npAllHeadings = np.full(len(allFrames), np.nan)
+    npAllHeadings[frames - st] = npHeadings
+    hasHeading = ~np.isnan(npAllHeadings)
+    if hasHeading.any():
+        headingFrames = allFrames[hasHeading]
+        between = (allFrames > headingFrames[0]) & (allFrames < headingFrames[-1])
+        interpolated = np.interp(allFrames, headingFrames, npAllHeadings[hasHeading])
+        npAllHeadings = np.where(~hasHeading & between, interpolated, npAllHeadings)
 
-def value(t: PointTuple[Point]):
-    return SQL("(") + SQL(",").join(map(Literal, t)) + SQL(")")
+    detected = dict(zip(ids, points))
+    return [
+        (
+            item_id,
+            camera_id,
+            object_type,
+            idx,
+            Point(detected.get(idx, p)),
+            None if math.isnan(h) else h,
+        )
+        for idx, p, h in zip(allFrames.tolist(), npAllPoints.tolist(), npAllHeadings.tolist())
+    ]
@@ -0,0 +1,35 @@
+import threading
+import time
+from collections.abc import Callable, Hashable
+from typing import Any, TypeVar
+
+M = TypeVar("M")
+
+# Models loaded in this process, keyed by their weights and device
+_models: "dict[Hashable, Any]" = {}
+_lock = threading.Lock()
+
+
+def load_model(key: Hashable, load: Callable[[], M], reload: bool = False) -> "tuple[M, float]":
+    """
+    Returns the model of `key`, loaded with `load` only the first time it is requested in the
+    process (or when `reload`), and the time in seconds spent loading it (0 if it is not loaded).
+    Models are shared by the Streams of every video and World in the process,
+    so they should not be modified after they are loaded.
+    Worker processes forked after a model is loaded inherit it.
+    """
+    with _lock:
+        if key in _models and not reload:
+            return _models[key], 0.0
+        start = time.perf_counter()
+        model = load()
+        _models[key] = model
+        return model, time.perf_counter() - start
+
+
+def clear_models():
+    """
+    Unload every model of the process.
+    """
+    with _lock:
+        _models.clear()
@@ -0,0 +1,46 @@
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    """
+    A queue of items indexed by their position in the sequence of all appended items.
+    Items before `start` are released; the buffer only keeps items from `start` to `end`,
+    and grows its capacity when full.
+    """
+
+    def __init__(self, capacity: int = 16):
+        assert capacity > 0, capacity
+        self._items: "list[T | None]" = [None] * capacity
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, index: int) -> T:
+        assert self.start <= index < self.end, (self.start, index, self.end)
+        item = self._items[index % len(self._items)]
+        assert item is not None
+        return item
+
+    def append(self, item: T):
+        if len(self) == len(self._items):
+            self._grow()
+        self._items[self.end % len(self._items)] = item
+        self.end += 1
+
+    def release(self, index: int):
+        """
+        Release all items before `index`.
+        """
+        while self.start < min(index, self.end):
+            self._items[self.start % len(self._items)] = None
+            self.start += 1
+
+    def _grow(self):
+        items: "list[T | None]" = [None] * (len(self._items) * 2)
+        for index in range(self.start, self.end):
+            items[index % len(items)] = self[index]
+        self._items = items
@@ -0,0 +1,119 @@
+import math
+from typing import TYPE_CHECKING
+
+import numpy as np
+import numpy.typing as npt
+from psycopg2 import sql
+from pyquaternion import Quaternion
+
+from ...database import database as default_database
+from ..camera_config import CameraConfig
+from ..stages.in_view.in_view import get_views, roadtype
+from ..video import Video
+
+if TYPE_CHECKING:
+    from ...database import Database
+
+# Fraction of the frame height that a region extends above the road, for the objects on it
+MARGIN = 0.1
+
+
+class RoadRegion:
+    """
+    The region of the frames of a video in which the road within `distance` of the camera
+    appears, as (left, top, right, bottom) pixels: the bounding box, over all frames,
+    of the road polygons (SegmentPolygon) in view, projected from the ground into the frames.
+    With `roadtypes`, only the polygons of these road types are projected.
+
+    The region extends `margin` of the frame height above the road, for the objects on it.
+    Objects that extend further above the road are cut at the top of the region,
+    which keeps the bottom of their boxes, where FromDetection2DAndRoad places them on the road.
+    """
+
+    def __init__(
+        self,
+        distance: float = 50,
+        roadtypes: "list[str] | None" = None,
+        database: "Database | None" = None,
+        margin: float = MARGIN,
+    ):
+        self.distance = distance
+        self.roadtypes = roadtypes
+        self.database = database
+        self.margin = margin
+
+    def __call__(self, video: Video) -> "tuple[int, int, int, int] | None":
+        """
+        Returns the region of the frames of `video`, or None if no road is in view.
+        """
+        indices, view_areas = get_views(video, self.distance)
+        database = self.database or default_database
+        where = sql.SQL("")
+        if self.roadtypes is not None:
+            where = sql.SQL("WHERE " + " OR ".join(map(roadtype, self.roadtypes)))
+        results = database.execute(
+            sql.SQL(
+                """
+        SELECT index, ST_X(point.geom), ST_Y(point.geom)
+        FROM UNNEST (
+            {view_areas},
+            {indices}::int[]
+        ) AS ViewArea(points, index)
+        JOIN SegmentPolygon ON ST_Intersects(ST_ConvexHull(points), elementPolygon)
+        CROSS JOIN LATERAL ST_DumpPoints(
+            ST_Intersection(ST_ConvexHull(points), elementPolygon)
+        ) AS point
+        {where}
+        """
+            ).format(
+                view_areas=sql.Literal(view_areas),
+                indices=sql.Literal(indices),
+                where=where,
+            )
+        )
+        if len(results) == 0:
+            return None
+
+        width, height = video.dimension
+        index = np.array([i for i, _, _ in results])
+        points = np.array([(x, y, 0) for _, x, y in results], dtype=np.float64).T
+
+        us: "list[npt.NDArray]" = []
+        vs: "list[npt.NDArray]" = []
+        for i in np.unique(index):
+            u, v = project(points[:, index == i], video.interpolated_frames[i], width, height)
+            us.append(u)
+            vs.append(v)
+        u, v = np.concatenate(us), np.concatenate(vs)
+
+        left = max(0, math.floor(u.min()))
+        right = min(width, math.ceil(u.max()))
+        top = max(0, math.floor(v.min() - self.margin * height))
+        bottom = min(height, math.ceil(v.max()))
+        if left >= right or top >= bottom:
+            return None
+        return left, top, right, bottom
+
+
+def project(
+    points: "npt.NDArray",
+    frame: "CameraConfig",
+    width: int,
+    height: int,
+) -> "tuple[npt.NDArray, npt.NDArray]":
+    """
+    Returns the pixel coordinates of the vertices of ground polygons (3xN world coordinates)
+    in `frame`. If a polygon crosses the plane of the camera, its edges to the vertices behind the
+    camera extend to the bottom, left and right of the frame, which are included instead.
+    """
+    rotation = Quaternion(frame.camera_rotation).unit.rotation_matrix
+    translation = np.array(frame.camera_translation)[:, np.newaxis]
+    from_camera = rotation.T @ (points - translation)
+
+    in_front = from_camera[2] > 0
+    pixels = np.array(frame.camera_intrinsic) @ from_camera[:, in_front]
+    u, v = pixels[0] / pixels[2], pixels[1] / pixels[2]
+    if not in_front.all():
+        u = np.concatenate([u, [0, width]])
+        v = np.concatenate([v, [height]])
+    return u, v
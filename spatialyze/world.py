@@ -1,7 +1,13 @@
 import datetime
+import hashlib
+import json
+import multiprocessing
+import os
 from typing import Type
 
+import pandas as pd
 import torch
+from psycopg2.sql import SQL, Literal
 
 from .data_types.query_result import QueryResult
 from .database import METADATA_TABLE, Database
@@ -18,14 +24,21 @@ from .predicate import (
 from .road_network import RoadNetwork
 from .utils.F.road_segment import road_segment
 from .utils.get_object_list import get_object_list
-from .utils.ingest_road import create_tables, drop_tables
+from .utils.ingest_road import (
+    create_tables,
+    drop_tables,
+    get_fingerprint,
+    set_fingerprint,
+)
 from .utils.save_video_util import save_video_util
+from .video_processor.stages.detection_2d.object_type_filter import object_types
 from .video_processor.stream.data_types import Detection2D, Detection3D, Skip
 from .video_processor.stream.decode_frame import DecodeFrame
 from .video_processor.stream.from_detection_2d_and_depth import FromDetection2DAndDepth
 from .video_processor.stream.from_detection_2d_and_road import FromDetection2DAndRoad
 from .video_processor.stream.mono_depth_estimator import MonoDepthEstimator
 from .video_processor.stream.object_type_pruner import ObjectTypePruner
+from .video_processor.stream.parallel_decode_frame import ParallelDecodeFrame
 from .video_processor.stream.prefilter import Prefilter
 from .video_processor.stream.prune_frames import PruneFrames
 from .video_processor.stream.road_visibility_pruner import RoadVisibilityPruner
@@ -35,12 +48,16 @@ from .video_processor.stream.stream import Stream
 from .video_processor.stream.strongsort import StrongSORT, TrackingResult
 from .video_processor.stream.yolo import Yolo
 from .video_processor.types import DetectionId
+from .video_processor.utils.disk_cache import DiskCache
 from .video_processor.utils.insert_detections import insert_detections
-from .video_processor.utils.insert_trajectory import insert_trajectory
+from .video_processor.utils.insert_trajectory import interpolate_trajectory
 from .video_processor.utils.prepare_trajectory import prepare_trajectory
+from .video_processor.utils.road_region import RoadRegion
 from .video_processor.video import Video
 
 TrackingResults = list[TrackingResult]
+# Instrumentation of each Stream of a video's pipeline, keyed by the name of the Stream
+StreamReport = dict[str, dict]
 
 
 class World:
@@ -53,7 +70,21 @@ class World:
         detector: Type[Stream[Detection2D]] | None = None,
         tracker: Type[Stream[TrackingResults]] | None = None,
         processor: Stream[TrackingResults] | None = None,
+        workers: int = 1,
+        incremental: bool = False,
+        pipelined: bool = False,
+        batch_size: int = 1,
+        buffer_size: int | None = None,
+        decode_workers: int = 1,
+        cache: DiskCache | None = None,
+        roi: bool = False,
+        threads: int | None = None,
     ):
+        if buffer_size is not None and buffer_size <= batch_size:
+            # the detector reads a batch of frames ahead of the frame the tracker holds
+            raise ValueError(
+                f"buffer_size ({buffer_size}) must be greater than batch_size ({batch_size})"
+            )
         self._database = database or default_database
         self._predicates = predicates or []
         self._videos = videos or []
@@ -61,9 +92,21 @@ class World:
         self._objectCounts = 0
         self._objects: "dict[str, list[QueryResult]] | None" = None
         self._trackings: "dict[str, list[TrackingResults]] | None" = None
+        self._reports: "dict[str, StreamReport] | None" = None
         self._detector: tuple[Type[Stream[Detection2D]]] = (detector or Yolo,)
         self._tracker: tuple[Type[Stream[TrackingResults]]] = (tracker or StrongSORT,)
         self._processor: Stream[TrackingResults] | None = processor
+        self._workers = workers
+        self._incremental = incremental
+        self._pipelined = pipelined
+        self._batch_size = batch_size
+        self._buffer_size = buffer_size
+        self._decode_workers = decode_workers
+        self._cache = cache
+        # detect objects only in the region of the frames where the road is (see RoadRegion)
+        self._roi = roi
+        # threads of intra-op parallelism of torch, which are process-wide
+        self._threads = threads
         # self._cameraCounts = 0
 
     @property
@@ -76,17 +119,17 @@ class World:
 
     def filter(self, predicate: "PredicateNode") -> "World":
         self._predicates.append(predicate)
-        self._objects, self._trackings = None, None
+        self._objects, self._trackings, self._reports = None, None, None
         return self
 
     def addVideo(self, video: "GeospatialVideo") -> "World":
         self._videos.append(video)
-        self._objects, self._trackings = None, None
+        self._objects, self._trackings, self._reports = None, None, None
         return self
 
     def addGeogConstructs(self, geogConstructs: "RoadNetwork") -> "World":
         self._geogConstructs.append(geogConstructs)
-        self._objects, self._trackings = None, None
+        self._objects, self._trackings, self._reports = None, None, None
         return self
 
     def object(self, index: "int | None" = None):
@@ -128,75 +171,254 @@ class World:
 
         return get_object_list(self._objects, self._trackings)
 
+    def getReport(self) -> "dict[str, StreamReport]":
+        """
+        Returns the instrumentation of the pipeline of each video, keyed by the video file,
+        then by the name of the Stream. For each Stream:
+        - wall time and CPU time spent inside the Stream, excluding its upstream Streams
+        - number of produced and skipped results
+        - time waited for the Stream's results (queue_wait) and for its consumers (buffer_wait)
+        - peak number of results buffered for lagging consumers
+        - time spent loading models that were not loaded yet in the process
+        """
+        if self._reports is None:
+            self._objects, self._trackings = _execute(self)
+        assert self._reports is not None
+        return self._reports
+
+    def saveReport(self, path: "str"):
+        with open(path, "w") as f:
+            json.dump(self.getReport(), f, indent=2)
 
-BATCH_SIZE = 2048
+    def getReportDataFrame(self) -> "pd.DataFrame":
+        """
+        Returns the report of `getReport` with one row per Stream of each video.
+        """
+        return pd.DataFrame.from_records(
+            [
+                {"video": video, "name": name, **stats}
+                for video, report in self.getReport().items()
+                for name, stats in report.items()
+            ]
+        )
 
 
 def _execute(world: "World", optimization=True):
     database = world._database
-    (detector,) = world._detector
-    (tracker,) = world._tracker
-    processor = world._processor
+    if world._incremental:
+        # fail before processing any video, rather than on a primary key violation
+        camera_ids = [v.camera[0].camera_id for v in world._videos]
+        shared = sorted({c for c in camera_ids if camera_ids.count(c) > 1})
+        if len(shared) > 0:
+            raise ValueError(
+                f"videos share camera ids {shared}; "
+                "incremental execution requires a unique camera id per video"
+            )
+
+    _ingest_geog_constructs(world, database)
+
+    if world._incremental:
+        # create the video tables once; each video's rows are scoped by its camera id
+        database.initialize()
+        database.clear()
+
+    temporal = not is_detection_only(world.predicates)
+
+    if world._workers > 1 and len(world._videos) > 1:
+        results = _execute_parallel(world, optimization, temporal)
+    else:
+        if world._threads is not None:
+            torch.set_num_threads(world._threads)
+        results = [
+            _execute_video(world, database, v, optimization, temporal) for v in world._videos
+        ]
+
+    qresults: dict[str, list[QueryResult]] = {}
+    vresults: dict[str, list[TrackingResults]] = {}
+    reports: dict[str, StreamReport] = {}
+    for v, (qresult, vresult, report) in zip(world._videos, results):
+        qresults[v.video] = qresult
+        vresults[v.video] = vresult
+        reports[v.video] = report
+    world._reports = reports
+    return qresults, vresults
+
+
+def _ingest_geog_constructs(world: "World", database: "Database"):
+    fingerprint = hashlib.sha256()
+    for gc in world._geogConstructs:
+        fingerprint.update(gc.fingerprint().encode())
+
+    # skip ingestion if the same geographic constructs are already in the database
+    if get_fingerprint(database) == fingerprint.hexdigest():
+        return
 
-    # add geographic constructs
     drop_tables(database)
     create_tables(database)
     for gc in world._geogConstructs:
         gc.ingest(database)
+    set_fingerprint(database, fingerprint.hexdigest())
 
-    temporal = not is_detection_only(world.predicates)
 
-    qresults: dict[str, list[QueryResult]] = {}
-    vresults: dict[str, list[TrackingResults]] = {}
-    for v in world._videos:
-        # reset database
+def _execute_video(
+    world: "World",
+    database: "Database",
+    v: "GeospatialVideo",
+    optimization: bool,
+    temporal: bool,
+) -> "tuple[list[QueryResult], list[TrackingResults], StreamReport]":
+    (detector,) = world._detector
+    (tracker,) = world._tracker
+    processor = world._processor
+
+    camera_id = v.camera[0].camera_id
+    if world._incremental:
+        # rows of other videos stay in the tables, the query is scoped by camera id
+        assert all(cc.camera_id == camera_id for cc in v.camera), camera_id
+    else:
         database.reset()
-        database.insert_camera(v.camera)
-
-        decode = DecodeFrame()
-        if v.keep is not None:
-            prefilter = Prefilter(v.keep)
-            decode = PruneFrames(prefilter, decode)
-        if optimization:
-            inview = RoadVisibilityPruner(distance=50, predicate=world.predicates)
-            decode = PruneFrames(inview, decode)
-        d2ds = detector(decode)
-
-        if optimization:
+    database.insert_camera(v.camera)
+
+    # frames pruned before decoding are skipped without being converted into arrays
+    pruner: Stream[bool] | None = None
+    if v.keep is not None:
+        pruner = Prefilter(v.keep)
+    if optimization:
+        inview = RoadVisibilityPruner(distance=50, predicate=world.predicates, database=database)
+        pruner = inview if pruner is None else PruneFrames(inview, pruner)
+    decode = (
+        ParallelDecodeFrame(pruner, workers=world._decode_workers, cache=world._cache)
+        if world._decode_workers > 1
+        else DecodeFrame(pruner, cache=world._cache)
+    )
+    # decoded frames are kept until both the detector and the tracker have consumed them
+    decode.buffer_size = world._buffer_size
+    # custom detectors and trackers accept batch_size like the built-in ones
+    classes: "list[int | str] | None" = None
+    region: "RoadRegion | None" = None
+    if issubclass(detector, Yolo):
+        types = object_types(world.predicates) if optimization else None
+        if types is not None:
+            # Yolo drops boxes of other types before they reach the downstream Streams
+            classes = [*sorted(types)]
+        if optimization and world._roi:
+            # objects are located on the road from the bottom of their boxes
+            region = RoadRegion(distance=50, database=database)
+        d2ds = detector(
+            decode,
+            batch_size=world._batch_size,
+            cache=world._cache,
+            classes=classes,
+            roi=region,
+        )
+    else:
+        d2ds = detector(decode, batch_size=world._batch_size)
+
+    if optimization:
+        if classes is None:
+            # custom detectors do not filter types themselves
             d2ds = ObjectTypePruner(d2ds, predicate=world.predicates)
-            d3ds = FromDetection2DAndRoad(d2ds)
-            # if temporal and all(t in ["car", "truck"] for t in d2ds.types):
-            #     efs = ExitFrameSampler(d3ds)
-            #     d3ds = PruneFrames(efs, d3ds)
-        else:
-            depths = MonoDepthEstimator(decode)
-            d3ds = FromDetection2DAndDepth(d2ds, depths)
-        t3ds = processor or tracker(d3ds, decode)
-
-        # execute pipeline
-        video = Video(v.video, v.camera)
-        database.update(f"INSERT INTO {METADATA_TABLE} (fps) VALUES ({video.fps})")
-        process = _track(t3ds) if temporal else _detect(d3ds)
-        vresults[v.video] = process(video, database)
-
-        assert all(idx == cc.frame_num for idx, cc in enumerate(v.camera)), [
-            cc.frame_num for cc in v.camera
-        ]
-        qresults[v.video] = database.predicate(world.predicates, temporal)
-    return qresults, vresults
+        d3ds = FromDetection2DAndRoad(d2ds)
+        # if temporal and all(t in ["car", "truck"] for t in d2ds.types):
+        #     efs = ExitFrameSampler(d3ds)
+        #     d3ds = PruneFrames(efs, d3ds)
+    else:
+        depths = MonoDepthEstimator(decode, batch_size=world._batch_size)
+        d3ds = FromDetection2DAndDepth(d2ds, depths)
+    t3ds = processor or tracker(d3ds, decode, batch_size=world._batch_size)
+
+    # execute pipeline
+    video = Video(v.video, v.camera)
+    database.update(
+        SQL(f"INSERT INTO {METADATA_TABLE} (cameraId, fps) VALUES ({{}}, {{}})").format(
+            Literal(camera_id), Literal(video.fps)
+        )
+    )
+    # the last Stream of the pipeline, which reports the stats of all its Streams
+    sink: "Stream" = t3ds if temporal else d3ds
+    process = _track(t3ds) if temporal else _detect(d3ds)
+    vresult = process(video, database, world._pipelined)
+
+    assert all(idx == cc.frame_num for idx, cc in enumerate(v.camera)), [
+        cc.frame_num for cc in v.camera
+    ]
+    scope = camera_id if world._incremental else None
+    return database.predicate(world.predicates, temporal, scope), vresult, sink.pipeline.stats()
+
+
+# (world, optimization, temporal) of the running parallel execution.
+# Worker processes are forked and inherit it, because predicates hold functions
+# (see `call_node`) that cannot be pickled.
+_worker_context: "tuple[World, bool, bool] | None" = None
+
+
+def _execute_parallel(world: "World", optimization: bool, temporal: bool):
+    global _worker_context
+    assert world._processor is None, "a processor instance cannot be shared across workers"
+    # worker processes are daemonic and cannot start the decode processes
+    assert world._decode_workers == 1, "parallel decode cannot run in parallel workers"
+    assert (
+        world._database.reconnectable
+    ), "parallel execution requires a Database created with connection params or a pool"
+
+    _worker_context = (world, optimization, temporal)
+    try:
+        workers = min(world._workers, len(world._videos))
+        with multiprocessing.get_context("fork").Pool(workers, _init_worker) as pool:
+            results = pool.map(_execute_worker, range(len(world._videos)), chunksize=1)
+    finally:
+        _worker_context = None
+
+    for schema in {schema for schema, _ in results}:
+        world._database.update(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+    return [result for _, result in results]
+
+
+def _init_worker():
+    assert _worker_context is not None
+    world, _, _ = _worker_context
+    # by default, the workers share the cores
+    torch.set_num_threads(world._threads or max(1, (os.cpu_count() or 1) // world._workers))
+
+    # connections inherited from the parent process cannot be used concurrently
+    default_database.reconnect()
+    if world._database is not default_database:
+        world._database.reconnect()
+
+    # each worker keeps its video tables in its own schema
+    world._database.use_schema(f"spatialyze_worker_{os.getpid()}")
+    if world._incremental:
+        world._database.initialize()
+        world._database.clear()
+
+
+def _execute_worker(index: int):
+    assert _worker_context is not None
+    world, optimization, temporal = _worker_context
+    database = world._database
+    assert database.schema is not None
+    try:
+        result = _execute_video(world, database, world._videos[index], optimization, temporal)
+    finally:
+        # the parent drops the worker's schema once all videos are processed;
+        # an idle transaction of the worker would hold locks on its tables
+        for db in {id(db): db for db in (database, default_database)}.values():
+            db.close(commit=True)
+    return database.schema, result
 
 
 def _track(processor: Stream[TrackingResults]):
-    def _(video: Video, database: Database):
+    def _(video: Video, database: Database, pipelined: bool):
         vresults: list[TrackingResults] = []
-        for track in processor.iterate(video):
+        for track in processor.iterate(video, pipelined):
             assert not isinstance(track, Skip)
             vresults.append(track)
 
             obj_id = track[0].object_id
             trajectory = prepare_trajectory(obj_id, track, video.camera_configs)
             if trajectory:
-                insert_trajectory(database, trajectory)
+                database.buffer_trajectory(interpolate_trajectory(trajectory))
+        database.flush()
         assert processor.ended()
         return vresults
 
@@ -204,11 +426,11 @@ def _track(processor: Stream[TrackingResults]):
 
 
 def _detect(processor: Stream[Detection3D]):
-    def _(video: Video, database: Database):
+    def _(video: Video, database: Database, pipelined: bool):
         camera_id = video[0].camera_id
         clss: list[str] | None = None
         vresults: list[TrackingResults] = []
-        for idx, detections in enumerate(processor.iterate(video)):
+        for idx, detections in enumerate(processor.iterate(video, pipelined)):
             if isinstance(detections, Skip) or len(detections[0]) == 0:
                 continue
 
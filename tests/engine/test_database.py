@@ -1,6 +1,7 @@
 import pickle
 
-from spatialyze.database import Database, CAMERA_TABLE, TRAJECTORY_TABLE
+from spatialyze.database import ConnectionPool, Database, CAMERA_TABLE, METADATA_TABLE, TRAJECTORY_TABLE
+from spatialyze.predicate import camera, objects
 import psycopg2
 import psycopg2.errors
 import os
@@ -41,6 +42,64 @@ def test_reset():
         assert d.sql("select * from " + t).empty
 
 
+def test_initialize_and_clear():
+    d = Database(psycopg2.connect(
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_RESET"],
+        password="postgres",
+    ))
+
+    with open('./data/nuscenes/processed/cameras.pkl', 'rb') as f:
+        cameras = pickle.load(f)
+    with open('./data/nuscenes/processed/annotations.pkl', 'rb') as f:
+        annotations = pickle.load(f)
+    key = [k for k in cameras if k.scene == "scene-0103" and k.channel == 'CAM_FRONT'][0]
+    d.reset(commit=True)
+    d.load_nuscenes(
+        {key: annotations[key]},
+        {key: cameras[key]},
+    )
+
+    d.initialize()
+    for t, c in TABLES:
+        assert d.execute(f"select count(*) from {t}")[0][0] == c, "should keep existing rows"
+
+    d.clear()
+    for t, _ in TABLES:
+        assert d.sql("select * from " + t).empty
+
+
+def test_initialize_outdated_schema():
+    d = Database(psycopg2.connect(
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_RESET"],
+        password="postgres",
+    ))
+
+    d.reset()
+    # a metadata table of a version without camera ids
+    d.update(f"DROP TABLE {METADATA_TABLE}")
+    d.update(f"CREATE TABLE {METADATA_TABLE} (fps Int)")
+    d.initialize()
+    d.update(f"INSERT INTO {METADATA_TABLE} (cameraId, fps) VALUES ('c', 12)")
+    assert d.execute(f"select cameraId, fps from {METADATA_TABLE}") == [('c', 12)]
+
+    # a camera table with another primary key
+    d.update(f"ALTER TABLE {CAMERA_TABLE} DROP CONSTRAINT camera_pkey CASCADE")
+    d.update(f"ALTER TABLE {CAMERA_TABLE} ADD PRIMARY KEY (frameId)")
+    d.initialize()
+    assert d.execute(f"select count(*) from {METADATA_TABLE}")[0][0] == 0, "should recreate the tables"
+
+    d.initialize()
+    d.update(f"INSERT INTO {METADATA_TABLE} (cameraId, fps) VALUES ('c', 12)")
+    d.initialize()
+    assert d.execute(f"select count(*) from {METADATA_TABLE}")[0][0] == 1, "should keep existing rows"
+
+
 def test_execute_update_and_query():
     d = Database(psycopg2.connect(
         dbname="postgres",
@@ -67,3 +126,163 @@ def test_execute_update_and_query():
 
     results = d.execute("select * from t1")
     assert results == [("test1", 3), ("test2", 4)], "should execute another query after failed executions"
+
+
+def test_connection_pool():
+    pool = ConnectionPool(
+        size=2,
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_SQL"],
+        password="postgres",
+    )
+
+    d1 = pool.database()
+    d2 = pool.database()
+    assert d1.execute("select 1") == [(1,)]
+    assert d2.execute("select 2") == [(2,)]
+    assert d1.connection is not d2.connection, "should borrow separate connections"
+
+    d1.close()
+    d3 = pool.database()
+    assert d3.execute("select 3") == [(3,)], "should reuse a returned connection"
+    d2.close()
+    d3.close()
+
+
+def test_close_commit():
+    d = Database.connect(
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_SQL"],
+        password="postgres",
+    )
+    d.update("create table if not exists t_close (c1 int)")
+    d.update("truncate t_close")
+
+    d.update("insert into t_close values (1)", commit=False)
+    d.close()
+    assert d.execute("select count(*) from t_close") == [(0,)], "should roll back"
+
+    d.update("insert into t_close values (1)", commit=False)
+    d.close(commit=True)
+    assert d.execute("select count(*) from t_close") == [(1,)], "should commit"
+    d.close()
+
+
+def test_connection_pool_schema():
+    pool = ConnectionPool(
+        size=1,
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_SQL"],
+        password="postgres",
+    )
+
+    d1 = pool.database()
+    d1.use_schema("spatialyze_test_pool")
+    assert d1.execute("show search_path") == [("spatialyze_test_pool, public",)]
+    d1.close()
+
+    d2 = pool.database()
+    assert d2.execute("show search_path") == [('"$user", public',)], "should reset the search_path"
+    d2.update("DROP SCHEMA spatialyze_test_pool CASCADE")
+    d2.close()
+
+
+def test_lazy_connect():
+    d = Database.connect(host="localhost", port="1", dbname="postgres")
+    with pytest.raises(psycopg2.OperationalError):
+        d.execute("select 1")
+
+
+def test_execute_iter_and_sql_chunks():
+    d = Database(psycopg2.connect(
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_SQL"],
+        password="postgres",
+    ))
+
+    query = "select i, i * 2 as j from generate_series(1, 10) as i"
+    rows = d.execute_iter(query, itersize=3)
+    assert list(rows) == [(i, i * 2) for i in range(1, 11)], "should stream all rows"
+
+    chunks = list(d.sql_chunks(query, chunksize=4))
+    assert [len(c) for c in chunks] == [4, 4, 2], "should yield chunks of at most chunksize rows"
+    assert list(chunks[0].columns) == ["i", "j"]
+    assert chunks[-1]["j"].tolist() == [18, 20]
+
+    with pytest.raises(psycopg2.errors.DatabaseError):
+        list(d.execute_iter("zxcvasdfqwer"))
+
+    assert d.execute("select 1") == [(1,)], "should execute another query after failed executions"
+
+
+def test_prepared_predicate():
+    d = Database(psycopg2.connect(
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_RESET"],
+        password="postgres",
+    ))
+
+    with open('./data/nuscenes/processed/cameras.pkl', 'rb') as f:
+        cameras = pickle.load(f)
+    with open('./data/nuscenes/processed/annotations.pkl', 'rb') as f:
+        annotations = pickle.load(f)
+    key = [k for k in cameras if k.scene == "scene-0103" and k.channel == 'CAM_FRONT'][0]
+    d.reset(commit=True)
+    d.load_nuscenes(
+        {key: annotations[key]},
+        {key: cameras[key]},
+    )
+
+    o = objects[0]
+    results = d.predicate(o.type == 'vehicle.car')
+    assert len(results) > 0
+    assert d.predicate(objects[0].type == 'vehicle.car') == results, "should reuse the prepared statement"
+    assert d.predicate(o.type == 'vehicle.car', camera_id=str(key)) == results
+    assert d.predicate(o.type == 'vehicle.car', camera_id="unknown") == []
+    assert set(d.predicate_iter(o.type == 'vehicle.car', itersize=10)) == set(results)
+
+    prepared = d.execute("select count(*) from pg_prepared_statements where name like 'spatialyze_predicate_%'")
+    assert prepared == [(2,)], "should prepare once per predicate and camera scoping"
+
+
+def test_plan_joins():
+    d = Database(psycopg2.connect(
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_RESET"],
+        password="postgres",
+    ))
+
+    with open('./data/nuscenes/processed/cameras.pkl', 'rb') as f:
+        cameras = pickle.load(f)
+    with open('./data/nuscenes/processed/annotations.pkl', 'rb') as f:
+        annotations = pickle.load(f)
+    key = [k for k in cameras if k.scene == "scene-0103" and k.channel == 'CAM_FRONT'][0]
+    d.reset(commit=True)
+    d.load_nuscenes(
+        {key: annotations[key]},
+        {key: cameras[key]},
+    )
+
+    o0, o1 = objects[0], objects[1]
+    predicate = (
+        (o0.type == 'vehicle.car') &
+        (o1.type == 'human.pedestrian.adult') &
+        (o0.id != o1.id) &
+        (camera.heading > 0)
+    )
+    d.plan_joins = False
+    expected = d.predicate(predicate)
+    d.plan_joins = True
+    assert set(d.predicate(predicate)) == set(expected), "should return the same results as the unplanned join"
@@ -1,5 +1,8 @@
 from spatialyze.database import Database
+from spatialyze.road_network import RoadNetwork
 from spatialyze.utils import ingest_road
+from spatialyze.utils.ingest_road import get_fingerprint
+from spatialyze.world import World, _ingest_geog_constructs
 import psycopg2
 import os
 import pytest
@@ -47,3 +50,29 @@ def test_incomplete_road_network():
     assert d2.execute("select count(*) from lane") == [(8,)]
     assert d2.execute("select count(*) from intersection") == [(1,)]
     assert d2.execute("select count(*) from segmentpolygon") == [(9,)]
+
+
+def test_cached_road_network():
+    d1 = Database(psycopg2.connect(
+        dbname="postgres",
+        user="postgres",
+        host="localhost",
+        port=os.environ["AP_PORT_ROAD_1"],
+        password="postgres",
+    ))
+    world = World(d1)
+    world.addGeogConstructs(RoadNetwork("boston-seaport", "./data/scenic/road-network/boston-seaport"))
+
+    _ingest_geog_constructs(world, d1)
+    fingerprint = get_fingerprint(d1)
+    assert fingerprint is not None
+    assert d1.execute("select count(*) from lane") == [(1180,)]
+
+    d1.update("insert into segmentpolygon (elementId, location) values ('marker', 'test')")
+    _ingest_geog_constructs(world, d1)
+    assert get_fingerprint(d1) == fingerprint
+    assert d1.execute("select count(*) from segmentpolygon where elementId = 'marker'") == [(1,)], \
+        "should skip ingesting the same road network"
+
+    ingest_road(d1, "./data/scenic/road-network/boston-seaport")
+    assert get_fingerprint(d1) is None, "should invalidate the fingerprint when re-ingesting"
@@ -164,3 +164,20 @@ def test_resolve_attr(resolve, out):
 ])
 def test_is_detection_only(predicate, result):
     assert is_detection_only(predicate) == result
+
+
+@pytest.mark.parametrize("fn1, fn2, same", [
+    (o.trans & o1.trans & c.cam, o.trans & o1.trans & c.cam, True),
+    (contains('intersection', o) & (o.type == 'car'), contains('intersection', o) & (o.type == 'car'), True),
+    (heading_diff(o, c, between=[0, 10]), heading_diff(o, c, between=[0, 10]), True),
+    (o.trans & o1.trans, o1.trans & o.trans, False),
+    (o.type == 'car', o.type == 'truck', False),
+    (o.heading == 1, o.heading == True, False),
+    (heading_diff(o, c, between=[0, 10]), heading_diff(o, c, excluding=[0, 10]), False),
+    (contains('intersection', o), contains('lane', o), False),
+])
+def test_structural_key(fn1, fn2, same):
+    assert (structural_key(fn1) == structural_key(fn2)) == same
+    if same:
+        assert hash(structural_key(fn1)) == hash(structural_key(fn2))
+        assert gen(normalize(fn1)) == gen(normalize(fn2))
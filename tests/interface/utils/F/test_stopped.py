@@ -7,10 +7,10 @@ c = camera
 
 
 @pytest.mark.parametrize("fn, sql", [
-    (stopped(o), "(EXIT (SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND t0.frameNum + ROUND(5 * (SELECT fps FROM Spatialyze_Metadata)) = frameNum) AND ST_Distance(t0.translation,(SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND t0.frameNum + ROUND(5 * (SELECT fps FROM Spatialyze_Metadata)) = frameNum))<5)"),
-    (stopped(o, distance=3.1), "(EXIT (SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND t0.frameNum + ROUND(5 * (SELECT fps FROM Spatialyze_Metadata)) = frameNum) AND ST_Distance(t0.translation,(SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND t0.frameNum + ROUND(5 * (SELECT fps FROM Spatialyze_Metadata)) = frameNum))<3.1)"),
-    (stopped(o, duration=6.5), "(EXIT (SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND t0.frameNum + ROUND(6.5 * (SELECT fps FROM Spatialyze_Metadata)) = frameNum) AND ST_Distance(t0.translation,(SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND t0.frameNum + ROUND(6.5 * (SELECT fps FROM Spatialyze_Metadata)) = frameNum))<5)"),
-    (stopped(o, distance=3.1, duration=6.5), "(EXIT (SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND t0.frameNum + ROUND(6.5 * (SELECT fps FROM Spatialyze_Metadata)) = frameNum) AND ST_Distance(t0.translation,(SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND t0.frameNum + ROUND(6.5 * (SELECT fps FROM Spatialyze_Metadata)) = frameNum))<3.1)"),
+    (stopped(o), "(EXIT (SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND cameraId = t0.cameraId AND t0.frameNum + ROUND(5 * (SELECT fps FROM Spatialyze_Metadata WHERE cameraId = t0.cameraId)) = frameNum) AND ST_Distance(t0.translation,(SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND cameraId = t0.cameraId AND t0.frameNum + ROUND(5 * (SELECT fps FROM Spatialyze_Metadata WHERE cameraId = t0.cameraId)) = frameNum))<5)"),
+    (stopped(o, distance=3.1), "(EXIT (SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND cameraId = t0.cameraId AND t0.frameNum + ROUND(5 * (SELECT fps FROM Spatialyze_Metadata WHERE cameraId = t0.cameraId)) = frameNum) AND ST_Distance(t0.translation,(SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND cameraId = t0.cameraId AND t0.frameNum + ROUND(5 * (SELECT fps FROM Spatialyze_Metadata WHERE cameraId = t0.cameraId)) = frameNum))<3.1)"),
+    (stopped(o, duration=6.5), "(EXIT (SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND cameraId = t0.cameraId AND t0.frameNum + ROUND(6.5 * (SELECT fps FROM Spatialyze_Metadata WHERE cameraId = t0.cameraId)) = frameNum) AND ST_Distance(t0.translation,(SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND cameraId = t0.cameraId AND t0.frameNum + ROUND(6.5 * (SELECT fps FROM Spatialyze_Metadata WHERE cameraId = t0.cameraId)) = frameNum))<5)"),
+    (stopped(o, distance=3.1, duration=6.5), "(EXIT (SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND cameraId = t0.cameraId AND t0.frameNum + ROUND(6.5 * (SELECT fps FROM Spatialyze_Metadata WHERE cameraId = t0.cameraId)) = frameNum) AND ST_Distance(t0.translation,(SELECT translation FROM Item_Trajectory WHERE itemId = t0.itemId AND cameraId = t0.cameraId AND t0.frameNum + ROUND(6.5 * (SELECT fps FROM Spatialyze_Metadata WHERE cameraId = t0.cameraId)) = frameNum))<3.1)"),
 ])
 def test_stopped(fn, sql):
     assert gen(fn) == sql
@@ -4,13 +4,14 @@ import pytest
 
 from bitarray import bitarray
 import numpy as np
+import torch
 
 from spatialyze.predicate import *
 from spatialyze.utils import F
 from spatialyze.video_processor.camera_config import camera_config
 from spatialyze.video_processor.payload import Payload
 
-from spatialyze.video_processor.stages.detection_2d.object_type_filter import FindType, ObjectTypeFilter
+from spatialyze.video_processor.stages.detection_2d.object_type_filter import FindType, ObjectTypeFilter, filter_types, object_types, type_mask
 from spatialyze.video_processor.stages.detection_2d.yolo_detection import YoloDetection
 from spatialyze.video_processor.pipeline import Pipeline
 from spatialyze.video_processor.video import Video
@@ -61,9 +62,52 @@ def test_predicates(fn, types):
     assert _types == types, (_types, types)
 
 
+@pytest.mark.parametrize("fn, types", [
+    (o.type == 'car', {'car'}),
+    (lit('car') == o.type, {'car'}),
+    ((o.type == 'car') & (o1.type == 'person'), {'car', 'person'}),
+    ((o.type == 'car') | (o.type == 'truck'), {'car', 'truck'}),
+    (((o.type == 'car') & (o1.type == 'car')) | ((o.type == 'truck') & (o1.type == 'bus')), {'car', 'truck', 'bus'}),
+    ((o.type == 'car') & F.like(o.type, 'c%'), {'car'}),
+    (F.has_types(o, 'car', 'truck') & (o1.type == 'person'), {'car', 'truck', 'person'}),
+    ((o.type == 'car') & (o.type == 'truck'), set()),
+
+    # Unrestricted objects
+    (F.like(o.type, 'vehicle%'), None),
+    (o.type != 'car', None),
+    (~(o.type == 'car'), None),
+    ((o.type == 'car') | (o.a > 1), None),
+    ((o.type == 'car') & (o1.a > 1), None),
+    (F.contains('intersection', o.type == 'car'), None),
+    (o.type == o1.type, None),
+    (lit(True), None),
+])
+def test_object_types(fn, types):
+    _types = object_types(fn)
+    assert _types == types, (_types, types)
+
+
 def test_objecttypefilter():
     assert repr(ObjectTypeFilter(types=['car', 'truck'])) == "ObjectTypeFilter(types=['car', 'truck'])"
     assert repr(ObjectTypeFilter(predicate=(o.type == 'car'))) == "ObjectTypeFilter(types=['car'])"
+    assert repr(ObjectTypeFilter(predicate=F.like(o.type, 'car%'))) == "ObjectTypeFilter(types=None)"
+
+
+def test_filter_types():
+    class_mapping = ['person', 'bicycle', 'car', 'truck']
+    mask = type_mask(['car', 'person'], class_mapping)
+    assert mask.tolist() == [True, False, True, False]
+
+    det = torch.tensor([[0, 0, 1, 1, 0.9, c] for c in [2, 3, 0, 1, 2]], dtype=torch.float)
+    _det, ids = filter_types(det, ['a', 'b', 'c', 'd', 'e'], mask)
+    assert torch.equal(_det, det[[0, 2, 4]])
+    assert ids == ['a', 'c', 'e']
+
+    _det, ids = filter_types(torch.zeros((0, 6)), [], mask)
+    assert len(_det) == 0 and ids == []
+
+    with pytest.raises(ValueError):
+        type_mask(['pedestrian'], class_mapping)
 
 
 def test_filter():
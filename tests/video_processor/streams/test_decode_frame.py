@@ -0,0 +1,71 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+from bitarray import bitarray
+
+from spatialyze.video_processor.stream.data_types import Skip
+from spatialyze.video_processor.stream.decode_frame import DecodeFrame
+from spatialyze.video_processor.stream.prefilter import Prefilter
+from spatialyze.video_processor.utils.disk_cache import DiskCache
+from spatialyze.video_processor.video import Video
+
+
+@pytest.fixture
+def videofile(tmp_path):
+    videofile = os.path.join(tmp_path, 'video.mp4')
+    writer = cv2.VideoWriter(videofile, cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    for i in range(40):
+        writer.write(np.full((48, 64, 3), i * 6, dtype=np.uint8))
+    writer.release()
+    return videofile
+
+
+def test_decode_frame(videofile):
+    video = Video(videofile, [])
+    frames = DecodeFrame().execute(video)
+    assert len(frames) == 40
+    # frames are shared by all consumers
+    assert not any(f.flags.writeable for f in frames)
+
+
+@pytest.mark.parametrize('seek_threshold', [None, 5])
+def test_decode_frame_pruner(videofile, seek_threshold):
+    video = Video(videofile, [])
+    expected = DecodeFrame().execute(video)
+
+    keep = bitarray([i % 3 == 0 or 10 <= i < 12 for i in range(30)] + [False] * 10)
+    decode = DecodeFrame(Prefilter(keep), seek_threshold=seek_threshold)
+    frames = decode.execute(video)
+    assert decode.ended()
+    assert len(frames) == len(keep)
+    for k, f, e in zip(keep, frames, expected):
+        if k:
+            assert np.array_equal(f, e)
+        else:
+            assert isinstance(f, Skip)
+
+    with pytest.raises(AssertionError):
+        DecodeFrame(Prefilter(bitarray('1' * 41))).execute(video)
+
+
+def test_decode_frame_cache(videofile, tmp_path):
+    video = Video(videofile, [])
+    expected = DecodeFrame().execute(video)
+    cache = DiskCache(os.path.join(tmp_path, 'cache'))
+
+    keep = bitarray([i % 2 == 0 for i in range(40)])
+    frames = DecodeFrame(Prefilter(keep), cache=cache).execute(video)
+    assert all(isinstance(f, Skip) != k for f, k in zip(frames, keep))
+
+    frames = DecodeFrame(cache=cache).execute(video)
+    assert len(frames) == len(expected)
+    assert all(np.array_equal(f, e) for f, e in zip(frames, expected))
+
+    # cached frames are read from the cache instead of being decoded
+    for decode in [DecodeFrame(cache=cache), DecodeFrame(Prefilter(keep), cache=cache)]:
+        frames = decode.execute(video)
+        assert all(np.array_equal(f, e) for f, e in zip(frames, expected) if not isinstance(f, Skip))
+        assert all(isinstance(f, (np.memmap, Skip)) for f in frames)
+        assert not any(f.flags.writeable for f in frames if not isinstance(f, Skip))
@@ -0,0 +1,128 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+from bitarray import bitarray
+
+from spatialyze.video_processor.stream.data_types import Skip
+from spatialyze.video_processor.stream.decode_frame import frames_namespace
+from spatialyze.video_processor.stream.parallel_decode_frame import ParallelDecodeFrame, _seek
+from spatialyze.video_processor.stream.prefilter import Prefilter
+from spatialyze.video_processor.utils.disk_cache import DiskCache
+from spatialyze.video_processor.video import Video
+
+
+@pytest.fixture
+def videofile(tmp_path):
+    videofile = os.path.join(tmp_path, 'video.mp4')
+    writer = cv2.VideoWriter(videofile, cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    for i in range(53):
+        writer.write(np.full((48, 64, 3), i * 4, dtype=np.uint8))
+    writer.release()
+    return videofile
+
+
+def decode(videofile):
+    cap = cv2.VideoCapture(videofile)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+@pytest.mark.parametrize('workers,chunk_size,window', [
+    (2, 10, None),
+    (3, 7, 2),
+    (1, 100, 1),
+    (4, 53, 8),
+])
+def test_parallel_decode_frame(videofile, workers, chunk_size, window):
+    video = Video(videofile, [])
+    expected = decode(videofile)
+
+    decode_frame = ParallelDecodeFrame(workers=workers, chunk_size=chunk_size, window=window)
+    frames = decode_frame.execute(video)
+    assert decode_frame.ended()
+    assert len(frames) == len(expected)
+    assert all(np.array_equal(f, e) for f, e in zip(frames, expected))
+    assert not any(f.flags.writeable for f in frames)
+    # frames are views of the shared memory written by the workers
+    assert all(isinstance(f, np.memmap) for f in frames)
+
+
+@pytest.mark.parametrize('chunk_size', [5, 10, 53])
+def test_parallel_decode_frame_pruner(videofile, chunk_size):
+    video = Video(videofile, [])
+    expected = decode(videofile)
+
+    keep = bitarray([i % 4 == 0 and not 10 <= i < 30 for i in range(len(expected))])
+    decode_frame = ParallelDecodeFrame(Prefilter(keep), workers=2, chunk_size=chunk_size)
+    frames = decode_frame.execute(video)
+    assert len(frames) == len(keep)
+    for k, f, e in zip(keep, frames, expected):
+        if k:
+            assert np.array_equal(f, e)
+        else:
+            assert isinstance(f, Skip)
+
+    with pytest.raises(AssertionError):
+        ParallelDecodeFrame(Prefilter(bitarray('1' * 60)), workers=2).execute(video)
+
+
+def test_parallel_decode_frame_missing_video(tmp_path):
+    video = Video(os.path.join(tmp_path, 'missing.mp4'), [])
+    with pytest.raises(AssertionError):
+        ParallelDecodeFrame(workers=2, chunk_size=10).execute(video)
+
+
+def test_parallel_decode_frame_cache(videofile, tmp_path):
+    video = Video(videofile, [])
+    expected = decode(videofile)
+    cache = DiskCache(os.path.join(tmp_path, 'cache'))
+
+    keep = bitarray([i % 2 == 0 for i in range(len(expected))])
+    decode_frame = ParallelDecodeFrame(Prefilter(keep), workers=2, chunk_size=10, cache=cache)
+    frames = decode_frame.execute(video)
+    assert all(isinstance(f, Skip) != k for f, k in zip(frames, keep))
+
+    # frames that are not cached yet are decoded, and the length of the video is cached
+    frames = ParallelDecodeFrame(workers=2, chunk_size=10, cache=cache).execute(video)
+    assert len(frames) == len(expected)
+    assert all(np.array_equal(f, e) for f, e in zip(frames, expected))
+    assert cache.get(frames_namespace(video), 'length')[0] == len(expected)
+
+    # cached frames are read from the cache instead of being decoded
+    for pruner in [None, Prefilter(keep)]:
+        frames = ParallelDecodeFrame(pruner, workers=2, chunk_size=10, cache=cache).execute(video)
+        assert len(frames) == len(expected)
+        assert all(np.array_equal(f, e) for f, e in zip(frames, expected) if not isinstance(f, Skip))
+        assert all(isinstance(f, (np.memmap, Skip)) for f in frames)
+        assert not any(f.flags.writeable for f in frames if not isinstance(f, Skip))
+
+
+class MisplacedSeek:
+    def __init__(self, cap, offset):
+        self.cap = cap
+        self.offset = offset
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value + self.offset)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+@pytest.mark.parametrize('offset', [0, -5, 5])
+def test_seek(videofile, offset):
+    expected = decode(videofile)
+
+    cap = _seek(MisplacedSeek(cv2.VideoCapture(videofile), offset), videofile, False, 20)
+    ret, frame = cap.read()
+    cap.release()
+    assert ret
+    assert np.array_equal(frame, expected[20])
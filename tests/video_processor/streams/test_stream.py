@@ -1,5 +1,14 @@
+import time
+
+import pytest
+from bitarray import bitarray
+
+from spatialyze.video_processor.stream.data_types import Skip, skip
 from spatialyze.video_processor.stream.list_images import ListImages
 from spatialyze.video_processor.stream.load_images import LoadImages
+from spatialyze.video_processor.stream.prefilter import Prefilter
+from spatialyze.video_processor.stream.prune_frames import PruneFrames
+from spatialyze.video_processor.stream.stream import Stream
 from spatialyze.video_processor.video import Video
 
 
@@ -14,3 +23,252 @@ def test_stream_end():
 
     images.execute(video)
     assert images.ended()
+
+
+def test_stream_pipelined():
+    video = Video('./data/scenic/images', [])
+
+    files = ListImages()
+    expected = files.execute(video)
+
+    images = LoadImages(files)
+    pruned = PruneFrames(Prefilter(bitarray([i % 2 == 0 for i in range(len(expected))])), images)
+    results = pruned.execute(video, pipelined=True)
+    assert pruned.ended()
+    assert len(results) == len(expected)
+    assert all(isinstance(r, Skip) == (i % 2 == 1) for i, r in enumerate(results))
+
+
+def test_stream_batched():
+    video = Video('./data/scenic/images', [])
+    keep = bitarray('0110111001')
+
+    class Batched(Stream[int]):
+        def __init__(self, prefilter: Stream[bool], batch_size: int):
+            self.prefilter = prefilter
+            self.batch_size = batch_size
+            self.batches: list[list[int]] = []
+
+        def _process(self, batch: list[int]) -> list[int]:
+            self.batches.append(batch)
+            return [i * 10 for i in batch]
+
+        def _stream(self, video):
+            inputs = (
+                skip if isinstance(k, Skip) else i
+                for i, k in enumerate(self.prefilter.stream(video))
+            )
+            yield from self._batched(inputs, self.batch_size, self._process)
+            self.end()
+
+    for batch_size in [1, 2, 4, 10]:
+        batched = Batched(Prefilter(keep), batch_size)
+        results = batched.execute(video)
+        assert results == [skip if not k else i * 10 for i, k in enumerate(keep)]
+        assert all(len(b) <= batch_size for b in batched.batches)
+        assert sum(map(len, batched.batches)) == keep.count(1)
+
+
+class Count(Stream[int]):
+    def __init__(self, n: int):
+        self.n = n
+        self.max_buffered = 0
+
+    def _stream(self, video):
+        for i in range(self.n):
+            self.max_buffered = max(self.max_buffered, len(self._results))
+            yield i
+        self.end()
+
+
+class LookAhead(Stream[int]):
+    def __init__(self, numbers: Stream[int], n: int):
+        self.numbers = numbers
+        self.n = n
+
+    def _stream(self, video):
+        ahead = []
+        for i in self.numbers.stream(video):
+            ahead.append(i)
+            if len(ahead) > self.n:
+                yield ahead.pop(0)
+        yield from ahead
+        self.end()
+
+
+class Pair(Stream[tuple]):
+    def __init__(self, left: Stream[int], right: Stream[int]):
+        self.left = left
+        self.right = right
+
+    def _stream(self, video):
+        yield from zip(self.left.stream(video), self.right.stream(video), strict=True)
+        self.end()
+
+
+def test_stream_buffer_size():
+    video = Video('./data/scenic/images', [])
+    expected = [(i, i) for i in range(20)]
+
+    numbers = Count(20)
+    numbers.buffer_size = 8
+    pair = Pair(numbers, LookAhead(numbers, 5))
+    assert pair.execute(video) == expected
+    assert numbers.max_buffered <= 8
+    assert len(numbers._results) == 0, "should release all consumed results"
+
+    numbers = Count(20)
+    numbers.buffer_size = 3
+    pair = Pair(numbers, LookAhead(numbers, 5))
+    with pytest.raises(AssertionError):
+        pair.execute(video)
+
+    numbers = Count(20)
+    numbers.buffer_size = 2
+    pair = Pair(numbers, LookAhead(numbers, 1))
+    assert pair.execute(video, pipelined=True) == expected
+    assert numbers.max_buffered <= 2
+
+
+class Batch(Stream[int]):
+    def __init__(self, numbers: Stream[int], batch_size: int):
+        self.numbers = numbers
+        self.batch_size = batch_size
+
+    def _stream(self, video):
+        yield from self._batched(self.numbers.stream(video), self.batch_size, lambda b: b)
+        self.end()
+
+
+class CountSkips(Stream[int]):
+    def __init__(self, n: int):
+        self.n = n
+
+    def _stream(self, video):
+        for i in range(self.n):
+            yield skip if i % 4 else i
+        self.end()
+
+
+def test_stream_buffer_size_batched():
+    video = Video('./data/scenic/images', [])
+
+    for pipelined in [False, True]:
+        # Skips do not fill the buffer, even when a batch spans many of them
+        numbers = CountSkips(40)
+        numbers.buffer_size = 3
+        pair = Pair(Batch(numbers, 2), numbers)
+        results = pair.execute(video, pipelined)
+        assert results == [(i, i) if i % 4 == 0 else (skip, skip) for i in range(40)]
+        assert numbers.stats.peak_buffered <= 3
+
+        # consumers ahead wait for each other's results while the buffer is full
+        numbers = Count(40)
+        numbers.buffer_size = 3
+        pair = Pair(Pair(Batch(numbers, 2), Batch(numbers, 2)), numbers)
+        assert pair.execute(video, pipelined) == [((i, i), i) for i in range(40)]
+        assert numbers.stats.peak_buffered <= 3
+
+
+def test_pipeline():
+    numbers = Count(3)
+    ahead = LookAhead(numbers, 1)
+    pair = Pair(numbers, ahead)
+
+    pipeline = pair.pipeline
+    assert pipeline is pair.pipeline, "should build the pipeline once"
+    assert pipeline.streams == [numbers, ahead, pair]
+    assert pipeline.consumers == {id(numbers): 2, id(ahead): 1, id(pair): 1}
+    assert pipeline.upstreams(pair) == [numbers, ahead]
+    assert pipeline.downstreams(numbers) == [ahead, pair]
+    assert pipeline.to_dot() == "\n".join([
+        "digraph Pipeline {",
+        '  Count_0 [label="Count"];',
+        '  LookAhead_1 [label="LookAhead"];',
+        '  Pair_2 [label="Pair"];',
+        "  Count_0 -> LookAhead_1;",
+        "  Count_0 -> Pair_2;",
+        "  LookAhead_1 -> Pair_2;",
+        "}",
+    ])
+
+    assert ahead.pipeline.streams == [numbers, ahead]
+    assert ahead.pipeline.consumers == {id(numbers): 1, id(ahead): 1}
+
+    video = Video('./data/scenic/images', [])
+    for _ in range(2):
+        assert pair.execute(video) == [(0, 0), (1, 1), (2, 2)]
+        assert pair.ended()
+
+
+class Sleep(Stream[int]):
+    def __init__(self, numbers: Stream[int], seconds: float):
+        self.numbers = numbers
+        self.seconds = seconds
+
+    def _stream(self, video):
+        for i in self.numbers.stream(video):
+            time.sleep(self.seconds)
+            yield skip if isinstance(i, Skip) or i % 2 else i
+        self.end()
+
+
+def test_stream_stats():
+    video = Video('./data/scenic/images', [])
+
+    for pipelined in [False, True]:
+        numbers = Count(4)
+        slow = Sleep(numbers, 0.05)
+        fast = Sleep(slow, 0.0)
+        assert len(fast.execute(video, pipelined)) == 4
+
+        stats = fast.pipeline.stats()
+        assert list(stats) == ["Count_0", "Sleep_1", "Sleep_2"]
+        assert stats["Sleep_1"]["stream"] == "Sleep"
+        assert (stats["Sleep_1"]["produced"], stats["Sleep_1"]["skipped"]) == (2, 2)
+        assert (stats["Count_0"]["produced"], stats["Count_0"]["skipped"]) == (4, 0)
+        assert stats["Count_0"]["peak_buffered"] == 1
+        # the time of a Stream excludes the time spent in its upstream Streams
+        assert stats["Sleep_1"]["wall_time"] >= 0.2
+        assert stats["Sleep_2"]["wall_time"] < 0.1
+        assert all(s["cpu_time"] < 0.1 for s in stats.values())
+        if pipelined:
+            # the fast Stream waits for the results of the slow Stream
+            assert stats["Sleep_1"]["queue_wait"] >= 0.1
+        else:
+            assert all(s["queue_wait"] == 0 for s in stats.values())
+
+    # instrumentation is reset for every video
+    fast.execute(video)
+    assert fast.stats.produced == 2
+
+
+class Model(Stream[int]):
+    def __init__(self, numbers: Stream[int], key: str):
+        self.numbers = numbers
+        self.key = key
+        self.offset = self._load_model((key, 'init'), lambda: (time.sleep(0.05), 10)[1])
+
+    def _stream(self, video):
+        scale = self._load_model((self.key, 'stream'), lambda: (time.sleep(0.05), 2)[1])
+        for i in self.numbers.stream(video):
+            yield skip if isinstance(i, Skip) else i * scale + self.offset
+        self.end()
+
+
+def test_stream_load_model():
+    video = Video('./data/scenic/images', [])
+    key = f'test_stream_load_model_{time.time()}'
+
+    model = Model(Count(3), key)
+    assert model.execute(video) == [10, 12, 14]
+    # models loaded in the constructor are reported with the first video
+    assert model.stats.load_time >= 0.1
+
+    assert model.execute(video) == [10, 12, 14]
+    assert model.stats.load_time == 0
+
+    # models are loaded once per process
+    other = Model(Count(3), key)
+    assert other.execute(video) == [10, 12, 14]
+    assert other.stats.load_time == 0
@@ -0,0 +1,42 @@
+import cv2
+import torch
+
+from spatialyze.video_processor.modules.yolo_tracker.yolov5.utils.general import xyxy2xywh
+from spatialyze.video_processor.modules.yolo_tracker.yolov5.utils.torch_utils import select_device
+from spatialyze.video_processor.stream.data_types import Detection2D, Skip, skip
+from spatialyze.video_processor.stream.strongsort import _load_tracker, _ReIDFeatures, _with_features
+from spatialyze.video_processor.types import DetectionId
+
+
+def features(strongsort, batch):
+    for detection, im0 in batch:
+        if isinstance(detection, Skip) or len(detection[0]) == 0:
+            continue
+        strongsort.height, strongsort.width = im0.shape[:2]
+        yield strongsort._get_features(xyxy2xywh(detection[0][:, 0:4].numpy()), im0)
+
+
+def test_batched_features():
+    strongsort = _load_tracker(select_device('cpu'))
+    image = cv2.imread('./data/scenic/images/example.jpg')
+    frames = [image, image[:, ::-1].copy(), image[::-1].copy()]
+    det = torch.tensor([
+        [10, 20, 110, 220, 0.9, 2],
+        [200, 50, 260, 150, 0.8, 0],
+        [0, 0, 50, 50, 0.7, 2],
+    ], dtype=torch.float)
+    batch = [
+        (Detection2D(det[:n], ['person', 'bicycle', 'car'], [DetectionId(i, o) for o in range(n)]), frame)
+        for i, (n, frame) in enumerate(zip([3, 0, 2], frames))
+    ] + [(skip, skip)]
+
+    # features of the detections computed one frame at a time
+    expected = list(features(strongsort, batch))
+    assert [len(f) for f in expected] == [3, 2]
+
+    strongsort.model = _ReIDFeatures(strongsort.model)
+    batched = list(features(strongsort, list(_with_features(strongsort, batch))))
+    assert len(strongsort.model.features) == 0
+    assert len(batched) == len(expected)
+    for b, e in zip(batched, expected):
+        assert torch.allclose(b, e, atol=1e-4)
@@ -0,0 +1,14 @@
+import pytest
+from bitarray import bitarray
+
+from spatialyze.video_processor.stream.deepsort import DeepSORT
+from spatialyze.video_processor.stream.prefilter import Prefilter
+from spatialyze.video_processor.stream.strongsort import StrongSORT
+
+
+@pytest.mark.parametrize('tracker', [StrongSORT, DeepSORT])
+def test_tracker_batch_size(tracker):
+    # World passes batch_size to the built-in trackers when it is larger than 1
+    keep = bitarray('1')
+    t = tracker(Prefilter(keep), Prefilter(keep), batch_size=4)
+    assert t.batch_size == 4
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+import torch
+
+from spatialyze.video_processor.modules.yolo_tracker.yolov5.utils.torch_utils import select_device
+from spatialyze.video_processor.stream.list_images import ListImages
+from spatialyze.video_processor.stream.load_images import LoadImages
+from spatialyze.video_processor.stream.yolo import Yolo, fixed_batch_size, load_exported, load_hub
+from spatialyze.video_processor.video import Video
+
+DEVICE = select_device('cpu')
+
+
+def export_torchscript(weights: str) -> str:
+    # as YOLOv5's export.py, with the stride and class names in the metadata
+    model = load_hub(DEVICE).model
+    ts = torch.jit.trace(model, torch.zeros(1, 3, 640, 640), strict=False)
+    config = {'shape': [1, 3, 640, 640], 'stride': int(max(model.stride)), 'names': model.names}
+    ts.save(weights, _extra_files={'config.txt': json.dumps(config)})
+    return weights
+
+
+def export_onnx(weights: str, dynamic: bool) -> str:
+    onnx = pytest.importorskip('onnx')
+    model = load_hub(DEVICE).model
+    torch.onnx.export(
+        model,
+        torch.zeros(1, 3, 640, 640),
+        weights,
+        opset_version=12,
+        input_names=['images'],
+        output_names=['output0'],
+        dynamic_axes={'images': {0: 'batch'}, 'output0': {0: 'batch'}} if dynamic else None,
+    )
+    exported = onnx.load(weights)
+    for key, value in {'stride': int(max(model.stride)), 'names': model.names}.items():
+        meta = exported.metadata_props.add()
+        meta.key, meta.value = key, str(value)
+    onnx.save(exported, weights)
+    return weights
+
+
+def test_load_exported_torchscript(tmp_path):
+    weights = export_torchscript(str(tmp_path / 'yolov5s.torchscript'))
+    model = load_exported(weights, DEVICE)
+    hub = load_hub(DEVICE)
+    assert model.jit and not model.pt
+    assert model.stride == 32
+    assert model.names == hub.names
+    assert fixed_batch_size(model) is None
+
+    # traced models take batches of any size
+    im = torch.rand(2, 3, 640, 640)
+    with torch.no_grad():
+        assert torch.allclose(model(im), hub(im), atol=1e-3)
+
+
+def test_load_exported_onnx(tmp_path):
+    pytest.importorskip('onnxruntime')
+    weights = export_onnx(str(tmp_path / 'yolov5s.onnx'), dynamic=False)
+    threads = torch.get_num_threads()
+    model = load_exported(weights, DEVICE, threads=1)
+    hub = load_hub(DEVICE)
+    assert model.onnx and not model.pt
+    assert model.stride == 32
+    assert model.names == hub.names
+    assert model.session.get_session_options().intra_op_num_threads == 1
+    # the threads of the session do not change the threads of torch
+    assert torch.get_num_threads() == threads
+    assert fixed_batch_size(model) == 1
+
+    im = torch.rand(1, 3, 640, 640)
+    with torch.no_grad():
+        assert torch.allclose(model(im), hub(im), atol=1e-3)
+
+    dynamic = export_onnx(str(tmp_path / 'yolov5s-dynamic.onnx'), dynamic=True)
+    assert fixed_batch_size(load_exported(dynamic, DEVICE)) is None
+
+
+def test_exported_detections(tmp_path):
+    pytest.importorskip('onnxruntime')
+    video = Video('./data/scenic/images', [])
+    torchscript = export_torchscript(str(tmp_path / 'yolov5s.torchscript'))
+    onnx = export_onnx(str(tmp_path / 'yolov5s.onnx'), dynamic=False)
+
+    # exported models take frames padded to 640x640
+    expected = Yolo(LoadImages(ListImages()), weights=torchscript, batch_size=2).execute(video)
+    detections = Yolo(LoadImages(ListImages()), weights=onnx).execute(video)
+    assert len(detections) == len(expected) == 1
+    for d, e in zip(detections, expected):
+        assert len(e.detections) > 0
+        assert d.class_map == e.class_map
+        assert d.detection_ids == e.detection_ids
+        assert torch.allclose(d.detections, e.detections, atol=1)
+
+
+def test_exported_batch_size(tmp_path):
+    pytest.importorskip('onnxruntime')
+    weights = export_onnx(str(tmp_path / 'yolov5s.onnx'), dynamic=False)
+    with pytest.raises(ValueError):
+        Yolo(LoadImages(ListImages()), weights=weights, batch_size=2)
+
+    dynamic = export_onnx(str(tmp_path / 'yolov5s-dynamic.onnx'), dynamic=True)
+    yolo = Yolo(LoadImages(ListImages()), weights=dynamic, batch_size=2)
+    assert yolo.batch_size == 2
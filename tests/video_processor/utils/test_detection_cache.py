@@ -0,0 +1,40 @@
+import torch
+
+from spatialyze.video_processor.utils.detection_cache import CONF_THRES, DetectionCache
+from spatialyze.video_processor.utils.disk_cache import DiskCache
+
+
+def prediction(n: int, num_classes: int):
+    torch.manual_seed(n)
+    return torch.rand((n, 5 + num_classes))
+
+
+def test_detection_cache(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    detections = DetectionCache(cache, 'detections', 3)
+    assert 0 not in detections
+
+    predictions = {0: prediction(20, 3), 2: prediction(0, 3), 3: prediction(15, 3)}
+    for idx, pred in predictions.items():
+        detections.add(idx, pred, (384, 640))
+    detections.save()
+
+    detections = DetectionCache(cache, 'detections', 3)
+    assert detections.shape == (384, 640)
+    assert [idx in detections for idx in range(5)] == [True, False, True, True, False]
+    for idx, pred in predictions.items():
+        cached = detections.prediction(idx, torch.device('cpu'))
+        candidates = pred[pred[:, 4] > CONF_THRES]
+        assert cached.shape == (1, len(candidates), 8)
+        assert torch.equal(cached[0, :, :5], candidates[:, :5])
+        # only the most confident class of each candidate is kept
+        conf, cls = cached[0, :, 5:].max(1)
+        assert torch.equal(conf, candidates[:, 5:].max(1).values)
+        assert torch.equal(cls, candidates[:, 5:].max(1).indices)
+        assert ((cached[0, :, 5:] > 0).sum(1) == 1).all()
+
+    # frames detected later are added to the cached frames
+    detections.add(4, prediction(5, 3), (384, 640))
+    detections.save()
+    detections = DetectionCache(cache, 'detections', 3)
+    assert [idx in detections for idx in range(5)] == [True, False, True, True, True]
@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+
+from spatialyze.video_processor.utils.disk_cache import DiskCache
+
+
+def test_disk_cache(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    assert cache.get('frames', 0) is None
+
+    array = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    cache.put('frames', 0, array)
+    cached = cache.get('frames', 0)
+    assert cached is not None
+    assert np.array_equal(cached, array)
+    assert not cached.flags.writeable
+    assert cache.get('frames', 1) is None
+    assert cache.get('depths', 0) is None
+
+    cache.clear()
+    assert cache.get('frames', 0) is None
+
+
+def test_disk_cache_eviction(tmp_path):
+    array = np.zeros(1000, dtype=np.uint8)
+    cache = DiskCache(str(tmp_path), max_bytes=5100)
+    for i in range(4):
+        cache.put('frames', i, array)
+        os.utime(os.path.join(tmp_path, 'frames', f'{i}.npy'), ns=(i, i))
+    assert all(cache.get('frames', i) is not None for i in range(4))
+
+    # frame 0 is used most recently
+    for i in range(1, 4):
+        os.utime(os.path.join(tmp_path, 'frames', f'{i}.npy'), ns=(i, i))
+    cache.put('frames', 4, array)
+    assert cache.get('frames', 1) is None, 'should evict the least recently used array'
+    assert all(cache.get('frames', i) is not None for i in [0, 2, 3, 4])
+
+    # another cache on the same directory accounts for the existing arrays
+    cache = DiskCache(str(tmp_path), max_bytes=3000)
+    cache.put('depths', 0, array)
+    assert sum(cache.get('frames', i) is not None for i in range(5)) == 1
+    assert cache.get('depths', 0) is not None
@@ -2,11 +2,12 @@ import numpy as np
 import pytest
 import math
 
-from spatialyze.database import database
-from spatialyze.video_processor.utils.insert_trajectory import insert_trajectory
+from spatialyze.database import copy_loader, database, insert_loader
+from spatialyze.video_processor.utils.insert_trajectory import insert_trajectory, interpolate_trajectory
 from spatialyze.video_processor.utils.types import Trajectory
 
 
+@pytest.mark.parametrize("loader", [copy_loader, insert_loader])
 @pytest.mark.parametrize("params, output", [
     (
         Trajectory(
@@ -27,7 +28,8 @@ from spatialyze.video_processor.utils.types import Trajectory
         ]
     )
 ])
-def test_insert_trajectory(params, output):
+def test_insert_trajectory(params, output, loader, monkeypatch):
+    monkeypatch.setattr(database, "loader", loader)
     database.reset()
     for i in range (6):
         database.update(f"insert into Camera values ('1', {i}, {i}, '', null, null, null, null, null, null, null)");
@@ -39,3 +41,23 @@ def test_insert_trajectory(params, output):
     for r, o in zip(res, output):
         assert r[:4] == o[:4]
         assert np.allclose(np.array([r[4], *r[5]]), np.array([o[4], *o[5]]))
+
+
+def test_buffer_trajectory(monkeypatch):
+    monkeypatch.setattr(database, "buffer_size", 100)
+    monkeypatch.setattr(database, "buffer_seconds", 1000)
+    database.reset()
+    for i in range (6):
+        database.update(f"insert into Camera values ('1', {i}, {i}, '', null, null, null, null, null, null, null)");
+
+    trajectory = Trajectory('1', [0, 1, 5], "1", "car", [(1, 2, 3), (4, 5, 6), (7, 8, 9)], [None, None, None])
+    database.buffer_trajectory(interpolate_trajectory(trajectory))
+    assert database.execute("SELECT count(*) FROM Item_Trajectory") == [(0,)], "should not write before flushing"
+
+    database.flush()
+    assert database.execute("SELECT count(*) FROM Item_Trajectory") == [(6,)]
+
+    monkeypatch.setattr(database, "buffer_size", 6)
+    trajectory = Trajectory('2', [0, 5], "1", "car", [(1, 2, 3), (7, 8, 9)], [None, None])
+    database.buffer_trajectory(interpolate_trajectory(trajectory))
+    assert database.execute("SELECT count(*) FROM Item_Trajectory") == [(12,)], "should write once the buffer is full"
@@ -0,0 +1,108 @@
+import math
+import random
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+from postgis import Point
+
+from spatialyze.video_processor.utils.insert_trajectory import interpolate_trajectory
+from spatialyze.video_processor.utils.types import Trajectory
+
+
+def infer_heading(curItemHeading, prevPoint, current_point):
+    if curItemHeading is not None:
+        return math.degrees(curItemHeading)
+    if prevPoint is None:
+        return None
+    x1, y1, z1 = prevPoint
+    x2, y2, z2 = current_point
+    return math.degrees(math.atan2(y2 - y1, x2 - x1)) - 90
+
+
+def interpolate_trajectory_reference(trajectory: Trajectory):
+    """The previous (loop-based) implementation of interpolate_trajectory"""
+    item_id, ids, camera_id, object_type, points, headings = trajectory
+
+    prevPoint = None
+    st, en = ids[0], ids[-1]
+    tuples = [None for _ in range(st, en + 1)]
+
+    def point(idx, p, h):
+        return (item_id, camera_id, object_type, idx, p, h)
+
+    for i, p, h in zip(ids, points, headings):
+        h = infer_heading(h, prevPoint, p)
+        tuples[i - st] = point(i, p, h)
+        prevPoint = p
+
+    prevHeading = None
+    prevPoint = None
+    tuplesWithPoints = []
+    for idx in range(st, en + 1):
+        i = idx - st
+        t = tuples[i]
+        if t is None:
+            npPrevPoint = np.array(prevPoint)
+            npCurrPoint: None | npt.NDArray = None
+            for jdx in range(idx, en + 1):
+                j = jdx - st
+                nt = tuples[j]
+                if nt is None:
+                    continue
+                npnp = np.array(nt[4])
+                npCurrPoint = npPrevPoint + ((npnp - npPrevPoint) * (i - (i - 1)) / (j - (i - 1)))
+                break
+            assert isinstance(npCurrPoint, np.ndarray)
+            x, y, z = npCurrPoint
+            t = point(idx, (float(x), float(y), float(z)), None)
+            prevPoint = float(x), float(y), float(z)
+        else:
+            prevPoint = t[4]
+        tuplesWithPoints.append(point(idx, Point(prevPoint), t[5]))
+
+    tuplesWithPointsHeadings = []
+    for i, t in enumerate(tuplesWithPoints):
+        h = t[5]
+        if h is None and prevHeading is not None:
+            for j, nt in enumerate(tuplesWithPoints):
+                nh = nt[5]
+                if j <= i:
+                    continue
+                if nh is not None:
+                    h = prevHeading + ((nh - prevHeading) * (i - (i - 1)) / (j - (i - 1)))
+                    break
+        tuplesWithPointsHeadings.append((*t[:5], h))
+        prevHeading = h
+
+    return tuplesWithPointsHeadings
+
+
+def random_trajectory(seed: int):
+    rng = random.Random(seed)
+    n = rng.randint(1, 30)
+    ids = sorted(rng.sample(range(200), n))
+    points = [(rng.uniform(-100, 100), rng.uniform(-100, 100), rng.uniform(0, 1)) for _ in ids]
+    headings = [rng.choice([None, rng.uniform(-math.pi, math.pi)]) for _ in ids]
+    return Trajectory(str(seed), ids, "camera", "car", points, headings)
+
+
+@pytest.mark.parametrize("trajectory", [
+    Trajectory('1', [0, 1, 5], "1", "car", [(1, 2, 3), (4, 5, 6), (7, 8, 9)], [math.radians(1), None, math.radians(3)]),
+    Trajectory('2', [3], "1", "car", [(1, 2, 3)], [None]),
+    Trajectory('3', [3, 4], "1", "car", [(1, 2, 3), (4, 5, 6)], [None, None]),
+    Trajectory('4', [0, 10], "1", "car", [(1, 2, 3), (4, 5, 6)], [None, math.radians(30)]),
+    Trajectory('5', [0, 4, 10], "1", "car", [[1, 2, 3], [4, 5, 6], [4, 5, 6]], [math.radians(10), None, None]),
+    *map(random_trajectory, range(50)),
+])
+def test_interpolate_trajectory(trajectory: Trajectory):
+    result = interpolate_trajectory(trajectory)
+    expected = interpolate_trajectory_reference(trajectory)
+
+    assert len(result) == len(expected)
+    for r, e in zip(result, expected):
+        assert r[:4] == e[:4]
+        assert (r[5] is None) == (e[5] is None), (r, e)
+        if r[5] is not None:
+            assert np.isclose(r[5], e[5]), (r, e)
+        assert np.allclose(np.array(r[4].values()), np.array(e[4].values())), (r, e)
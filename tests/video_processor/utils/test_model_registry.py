@@ -0,0 +1,31 @@
+from spatialyze.video_processor.utils.model_registry import clear_models, load_model
+
+
+def test_load_model():
+    loads = []
+
+    def load():
+        loads.append(len(loads))
+        return object()
+
+    model, load_time = load_model(('test_load_model', 'weights', 'cpu'), load)
+    assert loads == [0]
+    assert load_time > 0
+
+    _model, load_time = load_model(('test_load_model', 'weights', 'cpu'), load)
+    assert _model is model
+    assert loads == [0]
+    assert load_time == 0
+
+    other, _ = load_model(('test_load_model', 'weights', 'cuda'), load)
+    assert other is not model
+    assert loads == [0, 1]
+
+    reloaded, _ = load_model(('test_load_model', 'weights', 'cpu'), load, reload=True)
+    assert reloaded is not model
+    assert loads == [0, 1, 2]
+
+    clear_models()
+    _model, _ = load_model(('test_load_model', 'weights', 'cpu'), load)
+    assert _model is not reloaded
+    assert loads == [0, 1, 2, 3]
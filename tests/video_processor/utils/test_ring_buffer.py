@@ -0,0 +1,27 @@
+import pytest
+
+from spatialyze.video_processor.utils.ring_buffer import RingBuffer
+
+
+def test_ring_buffer():
+    buffer = RingBuffer(capacity=2)
+    for i in range(5):
+        buffer.append(i)
+    assert len(buffer) == 5
+    assert [buffer[i] for i in range(5)] == [0, 1, 2, 3, 4]
+
+    buffer.release(3)
+    assert (buffer.start, buffer.end) == (3, 5)
+    with pytest.raises(AssertionError):
+        buffer[2]
+
+    for i in range(5, 20):
+        buffer.append(i)
+        buffer.release(i - 2)
+    assert len(buffer) == 3, "should keep only unreleased items"
+    assert [buffer[i] for i in range(17, 20)] == [17, 18, 19]
+    assert len(buffer._items) == 8, "should not grow when items are released"
+
+    buffer.release(100)
+    assert len(buffer) == 0
+    assert buffer.start == 20, "should not release items that are not appended"
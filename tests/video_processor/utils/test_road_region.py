@@ -0,0 +1,30 @@
+import datetime
+
+import numpy as np
+from pyquaternion import Quaternion
+
+from spatialyze.video_processor.camera_config import camera_config
+from spatialyze.video_processor.utils.road_region import project
+
+# camera 1.5m above the ground looking along the x axis, with x to the right and y down
+ROTATION = Quaternion(matrix=np.array([[0, 0, 1], [-1, 0, 0], [0, -1, 0]]))
+FRAME = camera_config(
+    'camera', 'frame', 0, 'frame.jpg',
+    (0, 0, 1.5), tuple(ROTATION), ((100, 0, 160), (0, 100, 120), (0, 0, 1)),
+    (0, 0, 0), (1, 0, 0, 0), datetime.datetime(2000, 1, 1), 0, 0, 'location',
+)
+
+
+def test_project():
+    points = np.array([[10, 0, 0], [10, 5, 0]]).T
+    u, v = project(points, FRAME, 320, 240)
+    assert np.allclose(u, [160, 110])
+    assert np.allclose(v, [135, 135])
+
+
+def test_project_behind_camera():
+    # a polygon that crosses the plane of the camera extends to the bottom and sides of the frame
+    points = np.array([[10, 0, 0], [-1, 0, 0]]).T
+    u, v = project(points, FRAME, 320, 240)
+    assert np.allclose(u, [160, 0, 320])
+    assert np.allclose(v, [135, 240])
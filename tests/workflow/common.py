@@ -6,7 +6,6 @@ import datetime
 import torch
 
 from bitarray import bitarray
-import psycopg2
 import numpy as np
 
 from spatialyze.video_processor.stream.strongsort import TrackingResult
@@ -25,21 +24,19 @@ OUTPUT_DIR = './data/pipeline/test-results'
 VIDEO_DIR =  './data/pipeline/videos'
 ROAD_DIR = './data/scenic/road-network/boston-seaport'
 
-def build_filter_world(pkl: bool = False, alt_tracker: bool = False, track: bool = True):
-    database = Database(
-        psycopg2.connect(
-            dbname=environ.get("AP_DB", "postgres"),
-            user=environ.get("AP_USER", "postgres"),
-            host=environ.get("AP_HOST", "localhost"),
-            port=environ.get("AP_PORT", "25432"),
-            password=environ.get("AP_PASSWORD", "postgres"),
-        )
+def build_filter_world(pkl: bool = False, alt_tracker: bool = False, track: bool = True, workers: int = 1):
+    database = Database.connect(
+        dbname=environ.get("AP_DB", "postgres"),
+        user=environ.get("AP_USER", "postgres"),
+        host=environ.get("AP_HOST", "localhost"),
+        port=environ.get("AP_PORT", "25432"),
+        password=environ.get("AP_PASSWORD", "postgres"),
     )
     files = os.listdir(VIDEO_DIR)
     with open(os.path.join(VIDEO_DIR, 'frames.pkl'), 'rb') as f:
         videos = pickle.load(f)
     
-    world = World(database, tracker=DeepSORT if alt_tracker else None)
+    world = World(database, tracker=DeepSORT if alt_tracker else None, workers=workers)
     world.addGeogConstructs(RoadNetwork('Boston-Seaport', ROAD_DIR))
     
     for video in videos.values():
@@ -0,0 +1,23 @@
+import pickle
+import os
+
+from spatialyze.world import _execute
+from common import build_filter_world, compare_objects, compare_trackings
+
+
+OUTPUT_DIR = './data/pipeline/test-results'
+
+
+def test_parallel_workflow():
+    world = build_filter_world(workers=2)
+    objects, trackings = _execute(world, optimization=False)
+    for t in trackings.values(): t.sort()
+    for o in objects.values(): o.sort()
+
+    with open(os.path.join(OUTPUT_DIR, 'simple-workflow-trackings.pkl'), 'rb') as f:
+        trackings_groundtruth = pickle.load(f)
+    compare_trackings(trackings, trackings_groundtruth)
+
+    with open(os.path.join(OUTPUT_DIR, 'simple-workflow-objects.pkl'), 'rb') as f:
+        objects_groundtruth = pickle.load(f)
+    compare_objects(objects, objects_groundtruth)
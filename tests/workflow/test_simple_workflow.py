@@ -1,8 +1,13 @@
+import datetime
 import pickle
 import json
 import os
 
-from spatialyze.world import _execute
+import pytest
+
+from spatialyze.geospatial_video import GeospatialVideo
+from spatialyze.video_processor.camera_config import camera_config
+from spatialyze.world import World, _execute
 from common import build_filter_world, compare_objects, compare_trackings, ResultsEncoder
 
 
@@ -35,3 +40,29 @@ def test_simple_workflow():
         objects_groundtruth = pickle.load(f)
     compare_objects(objects, objects_groundtruth)
 
+
+
+def test_world_buffer_size():
+    with pytest.raises(ValueError):
+        World(batch_size=4, buffer_size=4)
+    World(batch_size=4, buffer_size=5)
+
+
+def test_world_reset_report():
+    world = World()
+    world._objects, world._trackings, world._reports = {}, {}, {}
+    world.filter(world.object().type == 'car')
+    assert (world._objects, world._trackings, world._reports) == (None, None, None)
+
+
+def test_world_incremental_camera_ids():
+    camera = [camera_config(
+        'scene-0', 'frame-0', 0, 'frame-0.jpg',
+        (0, 0, 0), (1, 0, 0, 0), [[1, 0, 0], [0, 1, 0], [0, 0, 1]],
+        (0, 0, 0), (1, 0, 0, 0), datetime.datetime(2020, 1, 1), 0, 0, 'boston-seaport',
+    )]
+    world = World(incremental=True)
+    world.addVideo(GeospatialVideo('a.mp4', camera))
+    world.addVideo(GeospatialVideo('b.mp4', camera))
+    with pytest.raises(ValueError, match='scene-0'):
+        _execute(world)